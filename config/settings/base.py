@@ -326,6 +326,91 @@ SOCIALACCOUNT_FORMS = {"signup": "namis.users.forms.UserSocialSignupForm"}
 NAMIS_API = "https://namis.agriculture.gov.mw/main/api"
 NAMIS_USERNAME = "jkambere"
 NAMIS_PASSWORD = "jKambere@CAD0"
+# Connections kept open per worker process towards the DHIS2 server
+NAMIS_POOL_SIZE = env.int("NAMIS_POOL_SIZE", 16)
+NAMIS_KEEP_ALIVE = env.bool("NAMIS_KEEP_ALIVE", True)
+# Seconds to wait for DHIS2 to answer a single request
+NAMIS_TIMEOUT = env.int("NAMIS_TIMEOUT", 60)
+# How rows are posted: "sync" one at a time, "async" with NAMIS_CONCURRENCY
+# farmers in flight, "bulk" NAMIS_BATCH_SIZE farmers per request, "columnar"
+# converting the file in blocks of NAMIS_BLOCK_SIZE bytes, "pipeline" reading,
+# preparing, posting with NAMIS_CONCURRENCY threads and recording as separate
+# stages linked by queues of NAMIS_QUEUE_SIZE rows
+NAMIS_IMPORT_MODE = env("NAMIS_IMPORT_MODE", default="sync")
+NAMIS_CONCURRENCY = env.int("NAMIS_CONCURRENCY", 8)
+NAMIS_BATCH_SIZE = env.int("NAMIS_BATCH_SIZE", 50)
+NAMIS_BLOCK_SIZE = env.int("NAMIS_BLOCK_SIZE", 1 << 20)
+NAMIS_QUEUE_SIZE = env.int("NAMIS_QUEUE_SIZE", 256)
+# Threads posting rows in "sync" mode, results are still recorded in file order.
+# More workers than NAMIS_POOL_SIZE leaves the extra ones without a kept-alive connection
+NAMIS_WORKERS = env.int("NAMIS_WORKERS", 1)
+# Uploads of more than NAMIS_CHUNK_ROWS rows are posted by one Celery task per
+# chunk, each limited to NAMIS_CHUNK_TIME_LIMIT seconds
+NAMIS_CHUNK_ROWS = env.int("NAMIS_CHUNK_ROWS", 10000)
+NAMIS_CHUNK_TIME_LIMIT = env.int("NAMIS_CHUNK_TIME_LIMIT", 2 * 60 * 60)
+# Hard time limit of a whole upload task, which is stopped softly after NAMIS_FILE_SOFT_TIME_LIMIT
+NAMIS_FILE_SOFT_TIME_LIMIT = env.int("NAMIS_FILE_SOFT_TIME_LIMIT", 72000)
+NAMIS_FILE_TIME_LIMIT = env.int("NAMIS_FILE_TIME_LIMIT", 324000)
+# Upload tasks are acknowledged once done. Redis hands an unacknowledged task
+# to another worker after the visibility timeout, which must outlast them or
+# a running upload would be started a second time
+# https://docs.celeryq.dev/en/stable/getting-started/backends-and-brokers/redis.html#visibility-timeout
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "visibility_timeout": max(NAMIS_FILE_TIME_LIMIT, NAMIS_CHUNK_TIME_LIMIT + 600) + 60 * 60,
+}
+# Progress is checkpointed every NAMIS_CHECKPOINT_ROWS recorded rows and when a
+# job is stopped; a rerun of the same file resumes from it. Tasks stopped by
+# their time limit are resubmitted up to NAMIS_RESUME_RETRIES times
+NAMIS_CHECKPOINT = env.bool("NAMIS_CHECKPOINT", True)
+NAMIS_CHECKPOINT_ROWS = env.int("NAMIS_CHECKPOINT_ROWS", 100)
+NAMIS_RESUME_RETRIES = env.int("NAMIS_RESUME_RETRIES", 10)
+# Every upload is recorded as an ImportJob with a result per row, written to
+# the database NAMIS_RESULT_BATCH_SIZE rows at a time
+NAMIS_TRACK_RESULTS = env.bool("NAMIS_TRACK_RESULTS", True)
+NAMIS_RESULT_BATCH_SIZE = env.int("NAMIS_RESULT_BATCH_SIZE", 500)
+# Result files stay open for a job and are flushed every NAMIS_FLUSH_ROWS lines
+# or NAMIS_FLUSH_SECONDS seconds, and when the job ends or is stopped
+NAMIS_FLUSH_ROWS = env.int("NAMIS_FLUSH_ROWS", 100)
+NAMIS_FLUSH_SECONDS = env.float("NAMIS_FLUSH_SECONDS", 5.0)
+# Requests per second sent to DHIS2. The rate grows by NAMIS_RATE_INCREASE
+# per second while responses are healthy and is multiplied by
+# NAMIS_RATE_DECREASE on 429/5xx or answers slower than NAMIS_LATENCY_THRESHOLD
+NAMIS_RATE_LIMIT = env.float("NAMIS_RATE_LIMIT", 10)
+NAMIS_RATE_MIN = env.float("NAMIS_RATE_MIN", 1)
+NAMIS_RATE_MAX = env.float("NAMIS_RATE_MAX", 100)
+NAMIS_RATE_INCREASE = env.float("NAMIS_RATE_INCREASE", 1)
+NAMIS_RATE_DECREASE = env.float("NAMIS_RATE_DECREASE", 0.5)
+NAMIS_LATENCY_THRESHOLD = env.float("NAMIS_LATENCY_THRESHOLD", 10)
+# Connection errors, timeouts and 5xx are retried up to NAMIS_RETRY_ATTEMPTS
+# times per request, backing off from NAMIS_RETRY_BACKOFF seconds, with at most
+# NAMIS_RETRY_BUDGET retries per job
+NAMIS_RETRY_ATTEMPTS = env.int("NAMIS_RETRY_ATTEMPTS", 5)
+NAMIS_RETRY_BACKOFF = env.float("NAMIS_RETRY_BACKOFF", 1)
+NAMIS_RETRY_MAX_BACKOFF = env.float("NAMIS_RETRY_MAX_BACKOFF", 60)
+NAMIS_RETRY_BUDGET = env.int("NAMIS_RETRY_BUDGET", 1000)
+# After NAMIS_BREAKER_THRESHOLD failed requests in a row an endpoint is left
+# alone for NAMIS_BREAKER_TIMEOUT seconds and the import pauses on its row
+NAMIS_BREAKER_THRESHOLD = env.int("NAMIS_BREAKER_THRESHOLD", 5)
+NAMIS_BREAKER_TIMEOUT = env.int("NAMIS_BREAKER_TIMEOUT", 60)
+# Rows are checked against the program metadata before they are sent; the
+# metadata is cached for NAMIS_METADATA_TTL seconds
+NAMIS_VALIDATE = env.bool("NAMIS_VALIDATE", True)
+NAMIS_METADATA_TTL = env.int("NAMIS_METADATA_TTL", 60 * 60)
+# Blocks are resolved to org unit uids from a local copy of the hierarchy,
+# refreshed incrementally per job and pulled whole every NAMIS_ORG_UNIT_TTL seconds
+NAMIS_ORG_UNIT_TTL = env.int("NAMIS_ORG_UNIT_TTL", 7 * 24 * 60 * 60)
+NAMIS_ORG_UNIT_PAGE_SIZE = env.int("NAMIS_ORG_UNIT_PAGE_SIZE", 1000)
+# Farmers DHIS2 already has, or that appear earlier in the file, are skipped.
+# Rows are screened NAMIS_LOOKUP_BATCH_SIZE at a time, with one lookup request each
+NAMIS_SKIP_EXISTING = env.bool("NAMIS_SKIP_EXISTING", True)
+NAMIS_LOOKUP_BATCH_SIZE = env.int("NAMIS_LOOKUP_BATCH_SIZE", 200)
+# With NAMIS_UPSERT known farmers are updated where the row changed them instead
+# of being skipped. Found farmers are remembered for NAMIS_FARMER_TTL seconds
+NAMIS_UPSERT = env.bool("NAMIS_UPSERT", False)
+NAMIS_FARMER_TTL = env.int("NAMIS_FARMER_TTL", 30 * 24 * 60 * 60)
+# Rows whose content hash matches the last one posted for their NationalID
+# are skipped as unchanged
+NAMIS_DELTA = env.bool("NAMIS_DELTA", True)
 
 
 
@@ -0,0 +1,63 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    # Stops requests to an endpoint after `threshold` consecutive failures.
+    # Once `reset_timeout` has passed a single probe is let through: success
+    # closes the circuit again, failure reopens it.
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, threshold, reset_timeout):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.state == self.OPEN
+
+    def remaining(self):
+        return max(0, self.opened + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.OPEN and not self.remaining():
+                self.state = self.HALF_OPEN
+                self.probing = False
+                logger.info(f"Probing {self.name}")
+            if self.state == self.HALF_OPEN:
+                if self.probing:
+                    return False
+                self.probing = True
+            return self.state != self.OPEN
+
+    def success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} recovered, circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"{self.name} failing, circuit open for {self.reset_timeout}s")
+                self.state = self.OPEN
+                self.opened = time.monotonic()
+                self.probing = False
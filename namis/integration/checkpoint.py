@@ -0,0 +1,65 @@
+import hashlib
+import threading
+
+from .models import ImportCheckpoint
+
+
+class Checkpoint:
+    # Rows of a job that are recorded. Results may arrive out of order, so the
+    # checkpoint keeps the last row up to which all are recorded, plus the
+    # rows recorded past it with the reference of those that were posted.
+    # `flush` writes out whatever was recorded before the checkpoint claims it,
+    # and `job` is the ImportJob the rows are recorded to.
+
+    def __init__(self, name, first, interval, flush=None):
+        self.name = name
+        self.key = hashlib.sha256(name.encode()).hexdigest()
+        self.first = first
+        self.row = first
+        self.done = {}
+        self.interval = interval
+        self.flush = flush
+        self.job = None
+        self.unsaved = 0
+        # Reentrant, a signal may interrupt the thread while it holds the lock
+        self.lock = threading.RLock()
+
+    @classmethod
+    def load(cls, name, first, interval, flush=None):
+        checkpoint = cls(name, first, interval, flush)
+        saved = ImportCheckpoint.objects.filter(key=checkpoint.key).first()
+        if saved:
+            checkpoint.job = saved.job_id
+            checkpoint.row = max(first, saved.row)
+            checkpoint.done = {int(row): reference for row, reference in saved.done.items()}
+        return checkpoint
+
+    @property
+    def resumed(self):
+        return self.row > self.first or bool(self.done)
+
+    def recorded(self, row):
+        return row <= self.row or row in self.done
+
+    def mark(self, row, reference=None):
+        with self.lock:
+            self.done[row] = reference
+            while self.row + 1 in self.done:
+                self.row += 1
+                del self.done[self.row]
+            self.unsaved += 1
+            if self.unsaved >= self.interval:
+                self.save()
+
+    def save(self):
+        with self.lock:
+            if self.flush:
+                self.flush()
+            ImportCheckpoint.objects.update_or_create(
+                key=self.key,
+                defaults={"file": self.name[:255], "row": self.row, "done": self.done, "job_id": self.job},
+            )
+            self.unsaved = 0
+
+    def clear(self):
+        ImportCheckpoint.objects.filter(key=self.key).delete()
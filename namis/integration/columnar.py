@@ -0,0 +1,100 @@
+import csv
+import io
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from .mapping import MAPPINGS
+from .rows import Header, PreparedRow, Row
+from .util import to_bool
+
+
+def _boolean_columns(mappings):
+    columns = {}
+    for mapping in mappings:
+        for field in mapping.fields:
+            if field.column is None:
+                continue
+            boolean = field.converter is to_bool
+            if columns.setdefault(field.column, boolean) != boolean:
+                raise ValueError(f"Column {field.column} is mapped with different converters")
+    return {column for column, boolean in columns.items() if boolean}
+
+
+def _to_bool(array):
+    # Vectorized util.to_bool: "yes" in any case and padding is True, anything else False
+    return pc.equal(pc.utf8_lower(pc.utf8_trim_whitespace(array)), "yes")
+
+
+def _padded(text, width):
+    # A row with more or fewer cells than the header, parsed again and cut or
+    # padded to the header with empty cells
+    values = next(csv.reader(io.StringIO(text)), [])[:width]
+    return values + [""] * (width - len(values))
+
+
+def read_blocks(file, block_size, mappings=MAPPINGS):
+    # Reads a binary CSV file in blocks of about `block_size` bytes and yields,
+    # per block, the rows as read (for the result files) and the same rows with
+    # their mapped columns converted a column at a time.
+    booleans = _boolean_columns(mappings)
+    header = Header.of(next(csv.reader([file.readline().decode("utf-8-sig")])))
+    width = len(header.columns)
+    # Ragged rows by record number: arrow skips them and they are put back
+    # in place as their block is yielded, so one short row cannot fail the file
+    ragged = {}
+
+    def skip(row):
+        if row.number is None:
+            return "error"
+        ragged[row.number] = _padded(row.text, width)
+        return "skip"
+
+    reader = pacsv.open_csv(
+        file,
+        read_options=pacsv.ReadOptions(column_names=header.columns, block_size=block_size),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True, invalid_row_handler=skip),
+        # Every cell stays text, as with csv.DictReader
+        convert_options=pacsv.ConvertOptions(
+            column_types=dict.fromkeys(header.columns, pa.string()),
+            strings_can_be_null=False,
+        ),
+    )
+    converters = [
+        (lambda value: value.strip().lower() == "yes") if column in booleans else None
+        for column in header.columns
+    ]
+    read = 0
+
+    def restore(originals, prepared):
+        # The ragged rows that come next in the file
+        nonlocal read
+        while read + 1 in ragged:
+            read += 1
+            values = ragged.pop(read)
+            converted = [value if convert is None else convert(value) for convert, value in zip(converters, values)]
+            originals.append(Row(header, values))
+            prepared.append(PreparedRow(header, converted))
+
+    for batch in reader:
+        columns = []
+        converted = []
+        for name, array in zip(batch.schema.names, batch.columns):
+            values = array.to_pylist()
+            columns.append(values)
+            converted.append(_to_bool(array).to_pylist() if name in booleans else values)
+        originals = []
+        prepared = []
+        for values, prepared_values in zip(zip(*columns), zip(*converted)):
+            restore(originals, prepared)
+            read += 1
+            originals.append(Row(header, values))
+            prepared.append(PreparedRow(header, prepared_values))
+        restore(originals, prepared)
+        yield originals, prepared
+    originals = []
+    prepared = []
+    restore(originals, prepared)
+    if originals:
+        yield originals, prepared
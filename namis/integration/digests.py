@@ -0,0 +1,46 @@
+import hashlib
+
+import orjson
+
+from .mapping import MAPPINGS
+from .models import RowDigest
+
+
+def row_digest(record):
+    # Hash of the values a row is sent with, so that a file read in any mode,
+    # or with its columns reordered, hashes the same
+    values = [record.get("Blocks")]
+    for mapping in MAPPINGS:
+        values.extend(mapping.values(record))
+    return hashlib.sha256(orjson.dumps(values)).hexdigest()
+
+
+class DigestStore:
+    # Stored row hashes by NationalID. Hashes of posted rows are written
+    # `batch_size` at a time.
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = {}
+
+    def stored(self, national_ids):
+        return dict(
+            RowDigest.objects.filter(national_id__in=[national_id for national_id in national_ids if national_id])
+            .values_list("national_id", "digest")
+        )
+
+    def add(self, national_id, digest):
+        self.pending[national_id] = digest
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        RowDigest.objects.bulk_create(
+            [RowDigest(national_id=national_id, digest=digest) for national_id, digest in self.pending.items()],
+            update_conflicts=True,
+            unique_fields=["national_id"],
+            update_fields=["digest", "updated"],
+        )
+        self.pending = {}
@@ -1,7 +1,7 @@
 
 import logging
 from django.core.mail import EmailMessage
-from django.contrib.auth.models import User
+from django.contrib.auth import get_user_model
 from django.template.loader import render_to_string
 
 # Configure logging
@@ -9,7 +9,7 @@ logger = logging.getLogger(__name__)
 
 
 def send_email(subject, template_name, context=None, attachments=None):
-    users = User.objects.all()
+    users = get_user_model().objects.all()
     recipient_list = [user.email for user in users if user.email]
 
     html_message = render_to_string(template_name, context)
@@ -0,0 +1,27 @@
+import orjson
+
+
+class Template:
+    # JSON object whose constant members are serialized once. render() only
+    # encodes the variable members; bytes values are spliced in as they are,
+    # which lets already encoded arrays be nested without decoding them.
+
+    def __init__(self, variables, constants=None):
+        self.prefix = orjson.dumps(constants or {})[:-1]
+        separator = b"," if constants else b""
+        self.keys = []
+        for key in variables:
+            self.keys.append(separator + orjson.dumps(key) + b":")
+            separator = b","
+
+    def render(self, *values):
+        parts = [self.prefix]
+        for key, value in zip(self.keys, values):
+            parts.append(key)
+            parts.append(value if isinstance(value, bytes) else orjson.dumps(value))
+        parts.append(b"}")
+        return b"".join(parts)
+
+
+def encode(payload):
+    return payload if isinstance(payload, bytes) else orjson.dumps(payload)
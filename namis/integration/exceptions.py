@@ -0,0 +1,21 @@
+
+class APIError(Exception):
+    pass
+
+
+class UnavailableError(APIError):
+    # DHIS2 kept failing with connection errors, timeouts or 5xx
+    pass
+
+
+class CircuitOpenError(Exception):
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"{endpoint} is unavailable, retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class StoppedError(Exception):
+    # The job was stopped while a row waited for DHIS2 to recover
+    pass
@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+def as_text(value):
+    # Values as DHIS2 stores them, for comparing a row with a farmer
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value).strip()
+
+
+class Farmer:
+    # A tracked entity instance as DHIS2 has it: attribute values, the program
+    # enrollment and the event of each stage with its data values
+    __slots__ = ("reference", "attributes", "enrollment", "events")
+
+    def __init__(self, reference, attributes=None, enrollment=None, events=None):
+        self.reference = reference
+        self.attributes = attributes or {}
+        self.enrollment = enrollment
+        self.events = events or {}
+
+    @classmethod
+    def from_dict(cls, instance, program):
+        attributes = {
+            attribute.get("attribute"): as_text(attribute.get("value"))
+            for attribute in instance.get("attributes") or ()
+        }
+        enrollment = None
+        events = {}
+        for item in instance.get("enrollments") or ():
+            if item.get("program") != program:
+                continue
+            enrollment = item.get("enrollment")
+            for event in item.get("events") or ():
+                events[event.get("programStage")] = (event.get("event"), {
+                    value.get("dataElement"): as_text(value.get("value"))
+                    for value in event.get("dataValues") or ()
+                })
+        return cls(instance.get("trackedEntityInstance"), attributes, enrollment, events)
+
+
+class FarmerRegistry:
+    # NationalIDs of farmers DHIS2 already has, looked up `batch_size` per
+    # request, and of those met earlier in the file. Found references are
+    # cached across jobs; when known farmers are updated rather than skipped
+    # their current values are fetched as well.
+
+    summary_fields = "trackedEntityInstance,attributes[attribute,value]"
+    detail_fields = (
+        "trackedEntityInstance,attributes[attribute,value],"
+        "enrollments[enrollment,program,events[event,programStage,dataValues[dataElement,value]]]"
+    )
+
+    def __init__(self, api, program, attribute, batch_size, update=False):
+        self.api = api
+        self.program = program
+        self.attribute = attribute
+        self.batch_size = batch_size
+        self.update = update
+        self.known = {}
+        self.farmers = {}
+        self.looked_up = set()
+        self.seen = set()
+
+    def _cache_key(self, national_id):
+        return f"namis:farmer:{self.program}:{national_id}"
+
+    def _query(self, national_ids):
+        return self.api.get("trackedEntityInstances", params={
+            "program": self.program,
+            "ouMode": "ACCESSIBLE",
+            "filter": f"{self.attribute}:IN:{';'.join(national_ids)}",
+            "fields": self.detail_fields if self.update else self.summary_fields,
+            "skipPaging": "true",
+        })
+
+    def _cached(self, national_ids):
+        # Skipping only needs the reference, which the cache may already have
+        if self.update:
+            return []
+        cached = cache.get_many([self._cache_key(national_id) for national_id in national_ids])
+        found = []
+        for national_id in national_ids:
+            reference = cached.get(self._cache_key(national_id))
+            if reference:
+                self.known[national_id] = reference
+                found.append(national_id)
+        return found
+
+    def lookup(self, national_ids):
+        pending = [
+            national_id for national_id in dict.fromkeys(national_ids)
+            if national_id and national_id not in self.looked_up
+        ]
+        self.looked_up.update(self._cached(pending))
+        pending = [national_id for national_id in pending if national_id not in self.looked_up]
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            data = self._query(batch)
+            self.looked_up.update(batch)
+            found = {}
+            for instance in data.get("trackedEntityInstances") or ():
+                farmer = Farmer.from_dict(instance, self.program)
+                national_id = farmer.attributes.get(self.attribute)
+                if national_id:
+                    self.known[national_id] = farmer.reference
+                    self.farmers[national_id] = farmer
+                    found[self._cache_key(national_id)] = farmer.reference
+            cache.set_many(found, settings.NAMIS_FARMER_TTL)
+
+    def farmer(self, national_id):
+        if self.update:
+            return self.farmers.get(national_id)
+        return None
+
+    def check(self, national_id):
+        # Why the farmer must not be created, None for a new farmer or one to update
+        if not national_id:
+            return None
+        if national_id in self.known and not self.update:
+            return f"NationalID {national_id} is already registered as {self.known[national_id]}"
+        if national_id in self.seen:
+            return f"NationalID {national_id} appears earlier in the file"
+        self.seen.add(national_id)
+        return None
@@ -1,20 +1,26 @@
 
 import os
 from django.core.management.base import BaseCommand, CommandError
-from namis.integration.services import Processor
+from namis.integration.services import PROCESSORS, get_processor
+from namis.integration.shards import post_sharded
 
 class Command(BaseCommand):
     help = 'Process the file specified by the filepath'
 
     def add_arguments(self, parser):
         parser.add_argument('filepath', type=str, help='The path to the file to be processed')
+        parser.add_argument('--mode', choices=PROCESSORS.keys(), help='How rows are posted, defaults to NAMIS_IMPORT_MODE')
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes, each posting a part of the file')
 
     def handle(self, *args, **kwargs): 
         filepath = kwargs['filepath']
 
         if not os.path.isfile(filepath):
             raise CommandError(f'File "{filepath}" does not exist.')
-        processor = Processor()
+        if kwargs['processes'] > 1:
+            post_sharded(filepath, kwargs['processes'], kwargs['mode'])
+            return
+        processor = get_processor(kwargs['mode'])
         processor.read(filepath)
 
-       
\ No newline at end of file
+       
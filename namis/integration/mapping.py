@@ -0,0 +1,254 @@
+import orjson
+
+from .rows import Row
+from .util import to_bool
+
+
+def raw(value):
+    return value
+
+
+class Field:
+    # One DHIS2 attribute or data element: the uid it is sent as, the CSV
+    # column it is read from and how the cell is converted. Fields without
+    # a column keep the value DHIS2 already has, or are sent empty.
+    __slots__ = ("name", "uid", "column", "converter")
+
+    def __init__(self, name, uid, column=None, converter=raw):
+        self.name = name
+        self.uid = uid
+        self.column = column
+        self.converter = converter
+
+
+class Mapping:
+
+    def __init__(self, key, fields):
+        self.key = key
+        self.fields = fields
+        self.entries = self._compile_entries()
+        self.plans = {}
+
+    def _compile_entries(self):
+        # Everything but the value is serialized once, up to the value
+        entries = []
+        for field in self.fields:
+            head = orjson.dumps({"displayName": field.name, self.key: field.uid, "value": None})[:-len(b"null}")]
+            entries.append((field.name, field.uid, field.column, field.converter, head))
+        return entries
+
+    def _plan(self, header):
+        # Field entries with their column resolved to a position in the header's rows
+        plan = self.plans.get(header)
+        if plan is None:
+            plan = self.plans[header] = [
+                (name, uid, None if column is None else header.index[column], convert, head)
+                for name, uid, column, convert, head in self.entries
+            ]
+        return plan
+
+    def build(self, row, known=None):
+        # `known` holds the values DHIS2 has by uid, sent for fields without a column
+        if not isinstance(row, Row):
+            row = Row.from_dict(row)
+        key = self.key
+        known = known or {}
+        values = row.values
+        plan = self._plan(row.header)
+        if row.prepared:
+            return [
+                {"displayName": name, key: uid, "value": known.get(uid) if index is None else values[index]}
+                for name, uid, index, _, _ in plan
+            ]
+        return [
+            {"displayName": name, key: uid, "value": known.get(uid) if index is None else convert(values[index])}
+            for name, uid, index, convert, _ in plan
+        ]
+
+    def values(self, row):
+        # Converted values in field order, as build() would send them
+        if not isinstance(row, Row):
+            row = Row.from_dict(row)
+        values = row.values
+        plan = self._plan(row.header)
+        if row.prepared:
+            return [None if index is None else values[index] for _, _, index, _, _ in plan]
+        return [None if index is None else convert(values[index]) for _, _, index, convert, _ in plan]
+
+    def encode(self, row, known=None):
+        # Same entries as build(), as JSON bytes
+        if not isinstance(row, Row):
+            row = Row.from_dict(row)
+        dumps = orjson.dumps
+        known = known or {}
+        values = row.values
+        plan = self._plan(row.header)
+        if row.prepared:
+            return b"[" + b",".join([
+                head + dumps(known.get(uid) if index is None else values[index]) + b"}"
+                for _, uid, index, _, head in plan
+            ]) + b"]"
+        return b"[" + b",".join([
+            head + dumps(known.get(uid) if index is None else convert(values[index])) + b"}"
+            for _, uid, index, convert, head in plan
+        ]) + b"]"
+
+
+PROFILE_FIELDS = [
+    Field("SerialNumber", "c3aKgEhckfB"),
+    Field("NationalIDQRCode", "bGCIwhx0QWQ", "NationalIDQRCode", str),
+    Field("NationalID", "W6kJs5es1rY", "NationalID", str),
+    Field("HouseholdHead", "znJuOdk5Cdl", "HouseholdHead", str),
+    Field("Birthday", "gEjOqoZAviX", "Birthday", raw),
+    Field("Sex", "ij3vRdw9lju", "Sex", str),
+    Field("PhoneNumber", "fdrAPSn6xfz", "PhoneNumber", str),
+    Field("PhoneType", "tL4Iss9KsVC", "PhoneType", str),
+    Field("Education", "Qi0SsrtddJp", "Education", str),
+    Field("Occupation", "vjeRjLGKjHV", "Occupation", str),
+    Field("HeadCondition", "aJEyk9gIxcr", "HeadCondition", str),
+    Field("HouseholdCoordinates", "EHBa25SkWJg"),
+    Field("ADD", "EW2GONAplcf", "ADD", str),
+    Field("District", "SuWgGzt14Je", "District", str),
+    Field("Constituency", "GcB2oLrzWqb", "Constituency", str),
+    Field("TA", "xRmOhRvfniD", "TA", str),
+    Field("GVH", "HmENbD9wbaf", "GVH", str),
+    Field("NearestAdmarc", "ffoDQT1tJfz", "NearestAdmarc", str),
+    Field("NearestMarket", "QEzPjaQKA54", "NearestMarket", str),
+]
+
+HOUSEHOLD_DEMOGRAPHICS_FIELDS = [
+    Field("HouseholdSize", "V9ohTgE9gt6", "HouseholdSize", str),
+    Field("UnderFiveChildren", "LODyndrVqqy", "UnderFiveChildren", str),
+    Field("FarmingParticipants", "sdhYSHX6ADi", "FarmingParticipants", str),
+    Field("Disabilities", "lUj8KABoecG", "Disabilities", str),
+    Field("FarmingIncome", "jhsAI5u7Qtz", "FarmingIncome", str),
+    Field("OverallIncome", "wFBmGcv8oD5", "OverallIncome", str),
+    Field("MaritalStatus", "cxGvtTqFZRg", "MaritalStatus", str),
+    Field("PrimaryIncomeSource", "RY1Sjzog4uV", "PrimaryIncomeSource", str),
+    Field("SpouseName", "gESUD9F82QZ", "SpouseName", str),
+    Field("SpouseNationalIDQRCode", "f69kxpGfwar"),
+    Field("SpouseNationalID", "Qh0LStKoviT"),
+    Field("SpouseBirthday", "uE408f0Mjlv"),
+]
+
+FARMING_OVERVIEW_FIELDS = [
+    Field("FarmerGroupMember", "QqwVUXU3hGd", "FarmerGroup", to_bool),
+    Field("FarmerGroupName", "YhGb4g7jTSA", "FarmerGroupName", str),
+    Field("RentedLandSize", "cpEikdJudnS"),
+    Field("PermanentLandSize", "aVI6OByBS4R"),
+    Field("MaiFieldGPS", "v3Yo1rNuGwq"),
+    Field("LandLegalStatus", "fmUHqcHA8T7"),
+    Field("TotalLandSize", "aNCtzVQCjK4", "TotalLandSize", str),
+]
+
+SUPPORT_FIELDS = [
+    Field("CreditService", "wJlsR1WLgbO", "CreditService", to_bool),
+    Field("CreditServiceProvider", "xy26yMuqVC8", "CreditServiceProvider", str),
+    Field("Extension_FaceToFace", "QXL27V3TVYU", "Extension_FaceToFace", to_bool),
+    Field("Extension_SocialMedia", "OK7D6F0QUUS", "Extension_SocialMedia", to_bool),
+    Field("Extension_Radios", "LS007281CI9", "Extension_Radios", to_bool),
+    Field("Extension_Posters", "WER8M7KU1B7", "Extension_Posters", to_bool),
+    Field("Extension_FellowFarmers", "DNW7A591194", "Extension_FellowFarmers", to_bool),
+    Field("Extension_AgroSuppliers", "MFV29UFT85W", "Extension_AgroSuppliers", to_bool),
+    Field("PreferredMode_FaceToFace", "KYIG1490L46", "PreferredMode_FaceToFace", to_bool),
+    Field("PreferredMode_SocialMedia", "YHHTQ18U4XO", "PreferredMode_SocialMedia", to_bool),
+    Field("PreferredMode_Radios", "VATJC3AVWA0", "PreferredMode_Radios", to_bool),
+    Field("PreferredMode_Posters", "EYH70MDZT88", "PreferredMode_Posters", to_bool),
+    Field("PreferredMode_FellowFarmers", "HM27I955MNO", "PreferredMode_FellowFarmers", to_bool),
+    Field("PreferredMode_AgroSuppliers", "RO9J6CV17MU", "PreferredMode_AgroSuppliers", to_bool),
+    Field("ReceiptOfSupport", "jVcTS9kdNwU", "ReceiptOfSupport", to_bool),
+    Field("SourceOfSupport", "OyIgAUaoduw", "SourceOfSupport", str),
+    Field("SupportOrganization", "WLn93SWcfRV", "SupportOrganization", str),
+    Field("SupportDuration", "QYlx3R6TQ2q", "SupportDuration", str),
+    Field("Support_Cash", "UWH170UE2H6", "Support_Cash", to_bool),
+    Field("Support_Seeds", "KZ9499349G4", "Support_Seeds", to_bool),
+    Field("Support_Fertilizer", "AP0P42X1X24", "Support_Fertilizer", to_bool),
+    Field("Support_ExtensionService", "NCIZGNQ69IX", "Support_ExtensionService", to_bool),
+    Field("Support_Livestock", "SI34R4K3YLL", "Support_Livestock", to_bool),
+    Field("Support_LandManagement", "VN40U24X7TM", "Support_LandManagement", to_bool),
+    Field("Support_Nutrition", "FM7H5Z11ZRH", "Support_Nutrition", to_bool),
+    Field("ReceiptOfExtraSupport", "YsUioHiJjfg", "ReceiptOfExtraSupport", to_bool),
+    Field("SourceOfExtraSupport", "myv9cIOKZKe"),
+    Field("ExtraSupportOrganization", "FCp7LyZF4yN", "ExtraSupportOrganization", str),
+    Field("ExtraSupportDuration", "IuOQR1VnCYw", "ExtraSupportDuration", str),
+    Field("ExtraSupport_Cash", "YMV5FN1JW6H", "ExtraSupport_Cash", to_bool),
+    Field("ExtraSupport_Seeds", "HN42ASU8USI", "ExtraSupport_Seeds", to_bool),
+    Field("ExtraSupport_Fertilizer", "ZRQP7E5U1WG", "ExtraSupport_Fertilizer", to_bool),
+    Field("ExtraSupport_ExtensionService", "SJPSQ28ET7U", "ExtraSupport_ExtensionService", to_bool),
+    Field("ExtraSupport_Livestock", "LD1KT343F5T", "ExtraSupport_Livestock", to_bool),
+    Field("ExtraSupport_LandManagement", "SO3326C6N4G", "ExtraSupport_LandManagement", to_bool),
+    Field("ExtraSupport_Nutrition", "CHSTCBKLX69", "ExtraSupport_Nutrition", to_bool),
+]
+
+FARMING_METHOD_FIELDS = [
+    Field("UseIrrigation", "r0IkPiagdvQ", "UseIrrigation", to_bool),
+    Field("IrrigationType", "CXYfteuVgcQ", "IrrigationType", str),
+    Field("IrrigationMethod", "EK8O4uHpm28", "IrrigationMethod", str),
+    Field("EnergySource", "tB4VCxeipsv", "EnergySource", str),
+    Field("WaterSource", "GhFwhm9aVTG", "WaterSource", str),
+    Field("SurfaceWaterSource", "DDPpFvAgQ06", "SurfaceWaterSource", str),
+    Field("SubsurfaceWaterSource", "ejvXcsevL6X", "SubsurfaceWaterSource", str),
+    Field("EnterpriseType", "VlXtRS3X8vg", "EnterpriseType", str),
+    Field("Maize", "GUvE51AL6sI", "Maize", to_bool),
+    Field("Millet", "m2k52GtcsEv", "Millet", to_bool),
+    Field("Okra", "BwCQIRjaNKt", "Okra", to_bool),
+    Field("Onions", "jqAOwrpHG6J", "Onions", to_bool),
+    Field("Papaya", "zoskEfLmDA4", "Papaya", to_bool),
+    Field("PigeonPeas", "Lb70D9e8Cvz", "PigeonPeas", to_bool),
+    Field("Pineapple", "f6Q8V7FOFHK", "Pineapple", to_bool),
+    Field("Pumpkin", "oGlMqxJZTCU", "Pumpkin", to_bool),
+    Field("Rice", "QyMKnDBNcbu", "Rice", to_bool),
+    Field("Sesame", "VrvMIi1hUpo", "Sesame", to_bool),
+    Field("Sorghum", "CZFVe8qyIsM", "Sorghum", to_bool),
+    Field("Soyabean", "dGrPZZUxWCo", "Soyabean", to_bool),
+    Field("Sugarcane", "UnBHTZiHPWH", "Sugarcane", to_bool),
+    Field("Sunflower", "ePrhycaXAKN", "Sunflower", to_bool),
+    Field("SweetPotato", "HK4bZn7FpQL", "SweetPotato", to_bool),
+    Field("Tomatoes", "Ks0MuqEbwa3", "Tomatoes", to_bool),
+    Field("Wheat", "RXIclGKl3uq", "Wheat", to_bool),
+    Field("MainFoodCropOutput", "pg4jYMQwUPA", "MainFoodCropOutput", str),
+    Field("Pestcontrol_Fungicides", "LQ72O792KNB", "Pestcontrol_Fungicides", to_bool),
+    Field("Pestcontrol_Rodenticides", "VL74L2S4K7I", "Pestcontrol_Rodenticides", to_bool),
+    Field("Pestcontrol_Insecticides", "TR34G1G970S", "Pestcontrol_Insecticides", to_bool),
+    Field("Pestcontrol_Molluscicides", "MM9529F1695", "Pestcontrol_Molluscicides", to_bool),
+    Field("Pestcontrol_Herbicides", "MAJ86DJ210P", "Pestcontrol_Herbicides", to_bool),
+    Field("Pestcontrol_BiologicalMethods", "DK7G9XYY3O1", "Pestcontrol_BiologicalMethods", to_bool),
+    Field("Pestcontrol_TraditionalMethods", "GIC4WU397A9", "Pestcontrol_TraditionalMethods", to_bool),
+    Field("Fertilizer_NPK", "VF57Y1H90RR", "Fertilizer_NPK", to_bool),
+    Field("Fertilizer_Urea", "ONO7YG2DE45", "Fertilizer_Urea", to_bool),
+    Field("Fertilizer_DAP", "YZ94AP6367R", "Fertilizer_DAP", to_bool),
+    Field("Fertilizer_OrganicManure", "PD7M4XH7V1B", "Fertilizer_OrganicManure", to_bool),
+    Field("Fertilizer_Hybrid", "XUR592HS474", "Fertilizer_Hybrid", to_bool),
+    Field("Fertilizer_SulphateOfAmmonium", "XPT97TXC41K", "Fertilizer_SulphateOfAmmonium", to_bool),
+    Field("Fertilizer_CAN", "NNNIR789V4A", "Fertilizer_CAN", to_bool),
+    Field("Fertilizer_SuperD", "AD3W70P32Y1", "Fertilizer_SuperD", to_bool),
+    Field("Fertilizer_DCompound", "UR897V0HG36", "Fertilizer_DCompound", to_bool),
+    Field("SeedMultiplication", "VG27WiA9zd1", "SeedMultiplication", to_bool),
+    Field("KeepLivestock", "fn0M0La8dyl", "KeepLivestock", to_bool),
+    Field("MainPastureLand", "ejvXcsevL6X", "MainPastureLand", str),
+    Field("Cattle", "u43vGnAw8Wa", "Cattle", to_bool),
+    Field("Goat", "V4afoGT13Ko", "Goat", to_bool),
+    Field("Bees", "wkrIjG5Wlzq", "Bees", to_bool),
+    Field("Chicken", "gseaJTN0Ez1", "Chicken", to_bool),
+    Field("Ducks", "Ew9OkncLxzt", "Ducks", to_bool),
+    Field("GuineaFowls", "OoUdxiz4jgP", "GuineaFowls", to_bool),
+    Field("GuineaPigs", "QpoHNfefGs9", "GuineaPigs", to_bool),
+    Field("Pigeon", "ZZfUJKi4pDQ", "Pigeon", to_bool),
+    Field("Pigs", "pbJraIqWG7a", "Pigs", to_bool),
+    Field("Quills", "b067T9mhtsF", "Quills", str),
+    Field("Rabbits", "KeGhTSbpM2P", "Rabbits", to_bool),
+    Field("Sheep", "IIHE7akabKi", "Sheep", to_bool),
+    Field("Turkey", "Vi1V5duySTC", "Turkey", to_bool),
+    Field("FishFarmingPractice", "NlDVmTM0Xne", "FishFarmingPractice", to_bool),
+    Field("FishFarmingPurpose", "UvwWIPlR73A", "FishFarmingPurpose", str),
+    Field("ProductionPurpose", "uzEJJETmBoM"),
+    Field("LabourSource", "s6uNwAugtU5", "LabourSource", str),
+]
+
+PROFILE = Mapping("attribute", PROFILE_FIELDS)
+HOUSEHOLD_DEMOGRAPHICS = Mapping("dataElement", HOUSEHOLD_DEMOGRAPHICS_FIELDS)
+FARMING_OVERVIEW = Mapping("dataElement", FARMING_OVERVIEW_FIELDS)
+SUPPORT = Mapping("dataElement", SUPPORT_FIELDS)
+FARMING_METHOD = Mapping("dataElement", FARMING_METHOD_FIELDS)
+
+MAPPINGS = [PROFILE, HOUSEHOLD_DEMOGRAPHICS, FARMING_OVERVIEW, SUPPORT, FARMING_METHOD]
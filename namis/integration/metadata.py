@@ -0,0 +1,164 @@
+import logging
+import re
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+ELEMENT_FIELDS = "id,name,valueType,optionSet[id,options[code,name]]"
+PROGRAM_FIELDS = (
+    f"id,name,programTrackedEntityAttributes[mandatory,trackedEntityAttribute[{ELEMENT_FIELDS}]],"
+    f"programStages[id,name,programStageDataElements[compulsory,dataElement[{ELEMENT_FIELDS}]]]"
+)
+
+PHONE_NUMBER = re.compile(r"^\+?[0-9 ()-]{6,20}$")
+EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+class Element:
+    # A tracked entity attribute or data element as the program uses it
+    __slots__ = ("uid", "name", "value_type", "mandatory", "options")
+
+    def __init__(self, uid, name, value_type, mandatory, options):
+        self.uid = uid
+        self.name = name
+        self.value_type = value_type
+        self.mandatory = mandatory
+        self.options = options
+
+    @classmethod
+    def from_dict(cls, element, mandatory):
+        option_set = element.get("optionSet")
+        options = None
+        if option_set:
+            options = [(option.get("code"), option.get("name")) for option in option_set.get("options") or ()]
+        return cls(element["id"], element.get("name"), element.get("valueType"), bool(mandatory), options)
+
+
+class Metadata:
+
+    def __init__(self, attributes, stages):
+        self.attributes = attributes
+        self.stages = stages
+
+    @classmethod
+    def from_dict(cls, program):
+        attributes = {}
+        for item in program.get("programTrackedEntityAttributes") or ():
+            element = Element.from_dict(item["trackedEntityAttribute"], item.get("mandatory"))
+            attributes[element.uid] = element
+        stages = {}
+        for stage in program.get("programStages") or ():
+            elements = {}
+            for item in stage.get("programStageDataElements") or ():
+                element = Element.from_dict(item["dataElement"], item.get("compulsory"))
+                elements[element.uid] = element
+            stages[stage["id"]] = elements
+        return cls(attributes, stages)
+
+    def pairs(self, profile, stages):
+        # Each mapping with the program elements its fields are sent as
+        yield profile, self.attributes
+        for stage, mapping in stages:
+            yield mapping, self.stages.get(stage, {})
+
+
+def load_metadata(api, program):
+    # One pull per TTL for all jobs; the cache is Redis in production
+    key = f"namis:metadata:{program}"
+    data = cache.get(key)
+    if data is None:
+        data = api.get(f"programs/{program}", params={"fields": PROGRAM_FIELDS, "paging": "false"})
+        cache.set(key, data, settings.NAMIS_METADATA_TTL)
+        logger.info(f"Metadata for program {program} loaded")
+    return Metadata.from_dict(data)
+
+
+def _is_number(value):
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_integer(value):
+    try:
+        int(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_date(value):
+    try:
+        date.fromisoformat(value[:10])
+    except ValueError:
+        return False
+    return True
+
+
+# Checks per DHIS2 value type, for non-empty values; other types are accepted as text
+VALUE_TYPES = {
+    "NUMBER": _is_number,
+    "UNIT_INTERVAL": lambda value: _is_number(value) and 0 <= float(value) <= 1,
+    "PERCENTAGE": lambda value: _is_number(value) and 0 <= float(value) <= 100,
+    "INTEGER": _is_integer,
+    "INTEGER_POSITIVE": lambda value: _is_integer(value) and int(value) > 0,
+    "INTEGER_NEGATIVE": lambda value: _is_integer(value) and int(value) < 0,
+    "INTEGER_ZERO_OR_POSITIVE": lambda value: _is_integer(value) and int(value) >= 0,
+    "BOOLEAN": lambda value: value in {"true", "false"},
+    "TRUE_ONLY": lambda value: value == "true",
+    "DATE": _is_date,
+    "AGE": _is_date,
+    "DATETIME": _is_date,
+    "PHONE_NUMBER": lambda value: bool(PHONE_NUMBER.match(value)),
+    "EMAIL": lambda value: bool(EMAIL.match(value)),
+}
+
+
+class Validator:
+    # Checks a row against the program metadata before anything is sent:
+    # mandatory values, value types and option codes.
+
+    def __init__(self, metadata, profile, stages):
+        self.checks = [self._pair(mapping, elements) for mapping, elements in metadata.pairs(profile, stages)]
+
+    def _pair(self, mapping, elements):
+        # Only fields read from the file can be wrong in it
+        fields = [
+            (position, field, elements.get(field.uid))
+            for position, field in enumerate(mapping.fields)
+            if field.column is not None
+        ]
+        return mapping, [(position, field, element) for position, field, element in fields if element]
+
+    def _error(self, field, element, value):
+        if value is None or value == "":
+            if element.mandatory:
+                return f"{field.name} is mandatory"
+            return None
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        if element.options is not None:
+            if value not in {code for code, _ in element.options}:
+                return f"{field.name}: '{value}' is not a valid option"
+            return None
+        check = VALUE_TYPES.get(element.value_type)
+        if check and not check(value):
+            return f"{field.name}: '{value}' is not a valid {element.value_type.lower()}"
+        return None
+
+    def validate(self, row):
+        if not row.get("Blocks"):
+            return "Blocks is empty"
+        errors = []
+        for mapping, fields in self.checks:
+            values = mapping.values(row)
+            for position, field, element in fields:
+                error = self._error(field, element, values[position])
+                if error:
+                    errors.append(error)
+        return "; ".join(errors) or None
@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("integration", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("file", models.CharField(max_length=255)),
+                ("row", models.PositiveIntegerField(default=0)),
+                ("done", models.JSONField(default=dict)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("integration", "0003_importjob_importrowresult"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importcheckpoint",
+            name="job",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="integration.importjob",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="importrowresult",
+            constraint=models.UniqueConstraint(fields=("job", "row"), name="unique_job_row"),
+        ),
+    ]
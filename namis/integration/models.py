@@ -1,3 +1,91 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class RowDigest(models.Model):
+    # Content hash of the last row posted for a farmer, re-uploaded rows
+    # with the same hash are not sent again
+    national_id = models.CharField(max_length=64, unique=True)
+    digest = models.CharField(max_length=64)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.national_id
+
+
+class ImportCheckpoint(models.Model):
+    # How far an interrupted job got: every row up to `row` was recorded, and
+    # so were the rows in `done`, with the references of those posted
+    key = models.CharField(max_length=64, unique=True)
+    file = models.CharField(max_length=255)
+    row = models.PositiveIntegerField(default=0)
+    done = models.JSONField(default=dict)
+    # The job a resumed run goes on recording to
+    job = models.ForeignKey("ImportJob", null=True, blank=True, on_delete=models.SET_NULL)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file} at row {self.row}"
+
+
+class ImportJob(models.Model):
+    # One upload of a file. The counts are filled in from its row results
+    # when it ends, chunks and shards of a file all record to one job
+
+    class Status(models.TextChoices):
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    file = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.RUNNING)
+    posted = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    started = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "started"])]
+
+    def __str__(self):
+        return f"{self.file} ({self.status})"
+
+    def finish(self, status):
+        counts = dict(self.results.values_list("status").annotate(count=models.Count("id")))
+        self.posted = counts.get(ImportRowResult.Status.POSTED, 0)
+        self.failed = counts.get(ImportRowResult.Status.FAILED, 0)
+        self.skipped = counts.get(ImportRowResult.Status.SKIPPED, 0)
+        self.status = status
+        self.finished = timezone.now()
+        self.save()
+
+
+class ImportRowResult(models.Model):
+    # What became of one row of a job: the TEI it was posted as, or why it
+    # failed or was skipped
+
+    class Status(models.TextChoices):
+        POSTED = "posted", "Posted"
+        FAILED = "failed", "Failed"
+        SKIPPED = "skipped", "Skipped"
+
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name="results")
+    row = models.PositiveIntegerField()
+    national_id = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=16, choices=Status.choices)
+    reference = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # A row recorded again after a resumed run replaces its earlier result
+        constraints = [models.UniqueConstraint(fields=["job", "row"], name="unique_job_row")]
+        indexes = [
+            models.Index(fields=["job", "status"]),
+            models.Index(fields=["status", "created"]),
+            models.Index(fields=["national_id"]),
+        ]
+
+    def __str__(self):
+        return f"Row {self.row} of job {self.job_id}: {self.status}"
@@ -0,0 +1,128 @@
+import re
+from collections import Counter
+from collections import defaultdict
+
+from .rows import Row
+
+SEPARATORS = re.compile(r"[\W_]+")
+
+
+def option_key(value):
+    # Case, whitespace and punctuation do not tell options apart
+    return SEPARATORS.sub("", value.casefold())
+
+
+def edit_distance(first, second):
+    previous = list(range(len(second) + 1))
+    for i, a in enumerate(first, start=1):
+        current = [i]
+        for j, b in enumerate(second, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a != b)))
+        previous = current
+    return previous[-1]
+
+
+class OptionIndex:
+    # Option codes of one option set, looked up by code or name. A value that
+    # matches neither exactly is taken for a misspelling of an option only
+    # when one option is a single edit away per `letters` letters of it, and
+    # no other is as close: "Femal" is Female, "Unmarried" is not Married.
+    # Every lookup is remembered since a column repeats the same few values.
+    __slots__ = ("codes", "letters", "matches", "fuzzy")
+
+    def __init__(self, options, letters=5):
+        self.codes = {}
+        for code, name in options:
+            for label in (code, name):
+                if label:
+                    self.codes.setdefault(option_key(label), code)
+        self.letters = letters
+        self.matches = {}
+        # Values matched by spelling, reported so they can be reviewed
+        self.fuzzy = {}
+
+    def _closest(self, key):
+        allowed = min(2, len(key) // self.letters)
+        if not allowed:
+            return None
+        distances = {}
+        for option, code in self.codes.items():
+            distance = edit_distance(key, option)
+            if distance <= allowed:
+                distances[code] = min(distances.get(code, distance), distance)
+        if not distances:
+            return None
+        best = min(distances.values())
+        closest = [code for code, distance in distances.items() if distance == best]
+        return closest[0] if len(closest) == 1 else None
+
+    def lookup(self, value):
+        if value in self.matches:
+            return self.matches[value]
+        key = option_key(value)
+        code = self.codes.get(key)
+        if code is None and key:
+            code = self._closest(key)
+            if code is not None:
+                self.fuzzy[value] = code
+        self.matches[value] = code
+        return code
+
+
+class Normalizer:
+    # Translates the cells of columns sent as option set values to their codes
+
+    def __init__(self, metadata, profile, stages):
+        self.indexes = {}
+        for mapping, elements in metadata.pairs(profile, stages):
+            for field in mapping.fields:
+                element = elements.get(field.uid)
+                if field.column is not None and element and element.options:
+                    self.indexes.setdefault(field.column, OptionIndex(element.options))
+        self.positions = {}
+
+    def _positions(self, header):
+        positions = self.positions.get(header)
+        if positions is None:
+            positions = self.positions[header] = [
+                (header.index[column], column, index)
+                for column, index in self.indexes.items()
+                if column in header.index
+            ]
+        return positions
+
+    def _cells(self, row):
+        for position, column, index in self._positions(row.header):
+            value = row.values[position]
+            if isinstance(value, str) and value.strip():
+                yield position, column, value, index.lookup(value)
+
+    def normalize(self, row):
+        # A copy of the row with every value that could be matched replaced by its code
+        if not isinstance(row, Row):
+            row = Row.from_dict(row)
+        values = None
+        for position, _, value, code in self._cells(row):
+            if code is not None and code != value:
+                if values is None:
+                    values = list(row.values)
+                values[position] = code
+        if values is None:
+            return row
+        return type(row)(row.header, values)
+
+    def unmapped(self, rows):
+        return self.summarize(rows)[0]
+
+    def summarize(self, rows):
+        # Values matching no option, and values taken for a misspelt option
+        # with the code they become, counted per column
+        unmapped = defaultdict(Counter)
+        fuzzy = defaultdict(Counter)
+        for row in rows:
+            for _, column, value, code in self._cells(row):
+                if code is None:
+                    unmapped[column][value] += 1
+                elif value in self.indexes[column].fuzzy:
+                    fuzzy[column][(value, code)] += 1
+        return unmapped, fuzzy
@@ -0,0 +1,88 @@
+import logging
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .options import option_key
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "namis:orgunits"
+ORG_UNIT_FIELDS = "id,code,name,ancestors[name]"
+
+
+def _pull(api, since=None):
+    # Pages through the org unit hierarchy, only units changed since `since` if given
+    params = {"fields": ORG_UNIT_FIELDS, "pageSize": settings.NAMIS_ORG_UNIT_PAGE_SIZE}
+    if since:
+        params["filter"] = f"lastUpdated:gt:{since}"
+    units = {}
+    page = 1
+    while True:
+        data = api.get("organisationUnits", params={**params, "page": page})
+        for unit in data.get("organisationUnits") or ():
+            units[unit["id"]] = (unit.get("code"), unit.get("name"), [a.get("name") for a in unit.get("ancestors") or ()])
+        pager = data.get("pager") or {}
+        if page >= pager.get("pageCount", 1):
+            return units
+        page += 1
+
+
+def load_org_units(api):
+    # The full hierarchy is pulled once per NAMIS_ORG_UNIT_TTL, so removed
+    # units drop out; jobs in between only fetch the units updated since
+    # the last pull
+    started = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    now = time.time()
+    cached = cache.get(CACHE_KEY)
+    if cached is None or now - cached.get("pulled", 0) >= settings.NAMIS_ORG_UNIT_TTL:
+        units = _pull(api)
+        pulled = now
+        logger.info(f"{len(units)} org units loaded")
+    else:
+        units = cached["units"]
+        changed = _pull(api, since=cached["updated"])
+        units.update(changed)
+        pulled = cached["pulled"]
+        logger.info(f"{len(changed)} org units refreshed")
+    cache.set(CACHE_KEY, {"units": units, "updated": started, "pulled": pulled}, settings.NAMIS_ORG_UNIT_TTL)
+    return OrgUnitIndex(units)
+
+
+class OrgUnitIndex:
+    # Org units by uid, code and name. Names repeat across the hierarchy, so
+    # a name only resolves when the row's District and TA leave one unit.
+
+    def __init__(self, units):
+        self.uids = set(units)
+        self.codes = {}
+        self.names = {}
+        for uid, (code, name, ancestors) in units.items():
+            if code:
+                self.codes[option_key(code)] = uid
+            if name:
+                ancestors = {option_key(ancestor) for ancestor in ancestors if ancestor}
+                self.names.setdefault(option_key(name), []).append((uid, ancestors))
+        self.resolved = {}
+
+    def _by_name(self, value, scope):
+        candidates = self.names.get(option_key(value), ())
+        for place in scope:
+            if len(candidates) <= 1:
+                break
+            key = option_key(place) if place else None
+            if key:
+                candidates = [(uid, ancestors) for uid, ancestors in candidates if key in ancestors]
+        if len(candidates) == 1:
+            return candidates[0][0]
+        return None
+
+    def resolve(self, value, district=None, ta=None):
+        key = (value, district, ta)
+        if key not in self.resolved:
+            value = value.strip()
+            uid = value if value in self.uids else self.codes.get(option_key(value))
+            self.resolved[key] = uid or self._by_name(value, (district, ta))
+        return self.resolved[key]
@@ -0,0 +1,37 @@
+import os
+import shutil
+
+from .services import Processor
+
+RESULT_FILES = ("posted_file", "failed_file", "skipped_file", "log_file")
+
+
+def part_files(directory, index):
+    # Result files of one part of a job, merged into the usual ones once all have finished
+    return {
+        name: os.path.join(directory, f"{index:05}-{os.path.basename(getattr(Processor, name))}")
+        for name in RESULT_FILES
+    }
+
+
+def use_part_files(processor, directory, index):
+    for name, path in part_files(directory, index).items():
+        setattr(processor, name, path)
+
+
+def _append(source, target, header):
+    # Appends one part's file, leaving out its CSV header when the target has one
+    if not os.path.isfile(source):
+        return
+    exists = os.path.isfile(target)
+    with open(source, mode='r', newline='') as part, open(target, mode='a', newline='') as file:
+        if header and exists:
+            next(part, None)
+        shutil.copyfileobj(part, file)
+
+
+def merge_parts(directory, indexes):
+    for index in sorted(indexes):
+        for name, path in part_files(directory, index).items():
+            _append(path, getattr(Processor, name), header=name != "log_file")
+    shutil.rmtree(directory, ignore_errors=True)
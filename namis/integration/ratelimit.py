@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    # Token bucket whose refill rate follows AIMD: it grows additively while
+    # DHIS2 answers quickly and is cut multiplicatively when it pushes back.
+
+    def __init__(self, rate, min_rate, max_rate, increase, decrease, latency, cooldown=1, report_interval=60):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency = latency
+        self.cooldown = cooldown
+        self.report_interval = report_interval
+
+        self.tokens = 1
+        self.updated = time.monotonic()
+        self.reduced = 0
+        self.reported = self.updated
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        # Takes a token and returns how long the caller must wait before using it
+        with self.lock:
+            now = time.monotonic()
+            capacity = max(1, self.rate)
+            self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    def success(self, elapsed):
+        if elapsed > self.latency:
+            self.failure(f"latency {elapsed:.1f}s")
+            return
+        with self.lock:
+            # Roughly `increase` requests per second more for every second of success
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+            self._report()
+
+    def failure(self, reason):
+        with self.lock:
+            now = time.monotonic()
+            # Requests already in flight fail together, only cut once for them
+            if now - self.reduced < self.cooldown:
+                return
+            self.reduced = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            logger.warning(f"Rate reduced to {self.rate:.2f} requests/s after {reason}")
+
+    def _report(self):
+        now = time.monotonic()
+        if now - self.reported >= self.report_interval:
+            self.reported = now
+            logger.info(f"Current rate: {self.rate:.2f} requests/s")
@@ -0,0 +1,63 @@
+import orjson
+
+
+class ImportSummary:
+    __slots__ = ("status", "reference", "conflicts", "error")
+
+    def __init__(self, status, reference, conflicts, error):
+        self.status = status
+        self.reference = reference
+        self.conflicts = conflicts
+        self.error = error
+
+    @classmethod
+    def from_dict(cls, summary):
+        conflicts = [conflict.get("value") for conflict in summary.get("conflicts") or ()]
+        return cls(summary.get("status"), summary.get("reference"), conflicts, summary_error(summary))
+
+
+class ImportResult:
+    __slots__ = ("status", "message", "summaries")
+
+    def __init__(self, status, message, summaries):
+        self.status = status
+        self.message = message
+        self.summaries = summaries
+
+    @classmethod
+    def from_dict(cls, data):
+        response = data.get("response") or {}
+        summaries = [ImportSummary.from_dict(summary) for summary in response.get("importSummaries") or ()]
+        return cls(data.get("status"), data.get("message"), summaries)
+
+    @property
+    def reference(self):
+        return self.summaries[0].reference if self.summaries else None
+
+    @property
+    def error(self):
+        for summary in self.summaries:
+            if summary.error:
+                return summary.error
+        if self.status == "ERROR":
+            return self.message or "Import failed"
+        return None
+
+
+def summary_error(summary):
+    # First rejection in an import summary, looking into nested enrollments and events
+    if summary.get("status") == "ERROR":
+        conflicts = summary.get("conflicts") or ()
+        if conflicts:
+            return conflicts[0].get("value")
+        return summary.get("description") or "Import failed"
+    for nested in ("enrollments", "events"):
+        for child in (summary.get(nested) or {}).get("importSummaries") or ():
+            error = summary_error(child)
+            if error:
+                return error
+    return None
+
+
+def parse_response(content):
+    return ImportResult.from_dict(orjson.loads(content))
@@ -0,0 +1,48 @@
+from .models import ImportJob
+from .models import ImportRowResult
+
+
+class ResultStore:
+    # Row results of a job, written `batch_size` at a time
+
+    def __init__(self, job_id, batch_size):
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.pending = []
+
+    @classmethod
+    def start(cls, file, batch_size):
+        return cls(ImportJob.objects.create(file=file[:255]).pk, batch_size)
+
+    @classmethod
+    def resume(cls, job_id, batch_size):
+        ImportJob.objects.filter(pk=job_id).update(status=ImportJob.Status.RUNNING, finished=None)
+        return cls(job_id, batch_size)
+
+    def add(self, row, status, national_id="", reference="", error=""):
+        self.pending.append(ImportRowResult(
+            job_id=self.job_id,
+            row=row,
+            national_id=national_id[:64],
+            status=status,
+            reference=reference or "",
+            error=error or "",
+        ))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        ImportRowResult.objects.bulk_create(
+            self.pending,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=["job", "row"],
+            update_fields=["national_id", "status", "reference", "error", "created"],
+        )
+        self.pending = []
+
+    def finish(self, status):
+        self.flush()
+        ImportJob.objects.get(pk=self.job_id).finish(status)
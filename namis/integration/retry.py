@@ -0,0 +1,34 @@
+import logging
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    # Exponential backoff with full jitter, bounded per attempt and by a
+    # budget of retries shared by the whole job.
+
+    def __init__(self, attempts, backoff, max_backoff, budget):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget
+        self.remaining = budget
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.remaining = self.budget
+
+    def delay(self, attempt):
+        # Seconds to wait before retry number `attempt`, None when out of retries
+        if attempt >= self.attempts:
+            return None
+        with self.lock:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            if self.remaining == 0:
+                logger.warning("Retry budget exhausted, transient failures now fail their rows")
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))  # noqa: S311
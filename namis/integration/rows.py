@@ -0,0 +1,76 @@
+import csv
+import threading
+
+
+class Header:
+    # Column names of a file and their positions, shared by all of its rows.
+    # Headers are interned so that plans compiled for one can be reused.
+    __slots__ = ("columns", "index")
+
+    _interned = {}
+    _lock = threading.Lock()
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.index = {column: position for position, column in enumerate(columns)}
+
+    @classmethod
+    def of(cls, columns):
+        columns = tuple(columns)
+        with cls._lock:
+            header = cls._interned.get(columns)
+            if header is None:
+                header = cls._interned[columns] = cls(columns)
+            return header
+
+
+class Row:
+    __slots__ = ("header", "values")
+
+    # Whether the values already went through their fields' converters
+    prepared = False
+
+    def __init__(self, header, values):
+        self.header = header
+        self.values = values
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(Header.of(record.keys()), tuple(record.values()))
+
+    def __getitem__(self, column):
+        return self.values[self.header.index[column]]
+
+    def get(self, column, default=None):
+        position = self.header.index.get(column)
+        if position is None:
+            return default
+        return self.values[position]
+
+    def replace(self, column, value):
+        values = list(self.values)
+        values[self.header.index[column]] = value
+        return type(self)(self.header, values)
+
+    def to_dict(self):
+        return dict(zip(self.header.columns, self.values))
+
+
+class PreparedRow(Row):
+    __slots__ = ()
+
+    prepared = True
+
+
+def read_rows(file):
+    # csv.DictReader without the per-row dict: blank lines are skipped and
+    # short rows are padded with None
+    reader = csv.reader(file)
+    header = Header.of(next(reader, ()))
+    width = len(header.columns)
+    for values in reader:
+        if not values:
+            continue
+        if len(values) < width:
+            values += [None] * (width - len(values))
+        yield Row(header, values)
@@ -1,16 +1,44 @@
 
-import json
-import csv
+import asyncio
+import io
+import itertools
 import logging
 import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Full, Queue
+import httpx
+import orjson
 import requests
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.db import connection
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from datetime import datetime
-from types import SimpleNamespace
-from .util import JsonObject, to_bool
+from .encoding import Template, encode
+from .mapping import FARMING_METHOD, FARMING_OVERVIEW, HOUSEHOLD_DEMOGRAPHICS, PROFILE, SUPPORT
+from .util import generate_uid
 from .emails import send_email
+from .breaker import CircuitBreaker
+from .checkpoint import Checkpoint
+from .columnar import read_blocks
+from .digests import DigestStore, row_digest
+from .exceptions import APIError, CircuitOpenError, StoppedError, UnavailableError
+from .farmers import FarmerRegistry, as_text
+from .metadata import Validator, load_metadata
+from .models import ImportJob, ImportRowResult
+from .options import Normalizer
+from .orgunits import load_org_units
+from .ratelimit import RateLimiter
+from .results import ResultStore
+from .responses import parse_response
+from .rows import Row, read_rows
+from .sinks import ResultFile
+from .retry import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -20,908 +48,1266 @@ class API:
     api_username = settings.NAMIS_USERNAME
     api_password = settings.NAMIS_PASSWORD
 
+    pool_size = settings.NAMIS_POOL_SIZE
+    keep_alive = settings.NAMIS_KEEP_ALIVE
+    timeout = settings.NAMIS_TIMEOUT
+
     headers = {'Content-Type': 'application/json'}
 
+    # Statuses DHIS2 answers with when it is overloaded
+    throttle_statuses = {429, 502, 503, 504}
+
+    # Errors of the HTTP client, and those of them worth retrying
+    transport_errors = requests.RequestException
+    transient_errors = (requests.ConnectionError, requests.Timeout)
+
+    _instance = None
+    _pid = None
+    _lock = threading.Lock()
+
     def __init__(self):
         self.auth = HTTPBasicAuth(self.api_username, self.api_password)
+        self.session = self._create_session()
+        self.limiter = self._create_limiter()
+        self.retry = self._create_retry()
+        self.breakers = {}
+
+    @classmethod
+    def instance(cls):
+        # One client per worker process: a forked child must not reuse
+        # the sockets of its parent's pool.
+        pid = os.getpid()
+        if cls._instance is None or cls._pid != pid:
+            with cls._lock:
+                if cls._instance is None or cls._pid != pid:
+                    cls._instance = cls()
+                    cls._pid = pid
+        return cls._instance
+
+    def _create_session(self):
+        session = requests.Session()
+        session.auth = self.auth
+        session.headers.update(self.headers)
+        session.headers['Connection'] = 'keep-alive' if self.keep_alive else 'close'
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _create_limiter(self):
+        return RateLimiter(
+            rate=settings.NAMIS_RATE_LIMIT,
+            min_rate=settings.NAMIS_RATE_MIN,
+            max_rate=settings.NAMIS_RATE_MAX,
+            increase=settings.NAMIS_RATE_INCREASE,
+            decrease=settings.NAMIS_RATE_DECREASE,
+            latency=settings.NAMIS_LATENCY_THRESHOLD,
+        )
+
+    def _create_retry(self):
+        return RetryPolicy(
+            attempts=settings.NAMIS_RETRY_ATTEMPTS,
+            backoff=settings.NAMIS_RETRY_BACKOFF,
+            max_backoff=settings.NAMIS_RETRY_MAX_BACKOFF,
+            budget=settings.NAMIS_RETRY_BUDGET,
+        )
+
+    def _breaker(self, endpoint):
+        # One circuit per resource, e.g. "events" for "events/<uid>"
+        name = endpoint.split("?")[0].split("/")[0]
+        with self._lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(
+                    name,
+                    threshold=settings.NAMIS_BREAKER_THRESHOLD,
+                    reset_timeout=settings.NAMIS_BREAKER_TIMEOUT,
+                )
+            return self.breakers[name]
+
+    def _unavailable(self, endpoint, breaker):
+        return CircuitOpenError(endpoint, retry_after=max(breaker.remaining(), 1))
 
     def _build(self, endpoint):
         return f"{self.api_url}/{endpoint}"
 
+    def _track(self, response, started):
+        if response.status_code in self.throttle_statuses:
+            self.limiter.failure(f"status {response.status_code}")
+        else:
+            self.limiter.success(time.monotonic() - started)
+
+    def _retryable(self, response):
+        # Creates are keyed by client uids, so resending after a 5xx is safe
+        return response.status_code == 429 or response.status_code >= 500
+
+    def _import_result(self, endpoint, response):
+        try:
+            return parse_response(response.content)
+        except ValueError as e:
+            raise APIError(f"Invalid response ({response.status_code}) from {endpoint}") from e
+
+    def _json(self, endpoint, response):
+        if response.status_code >= 400:
+            raise APIError(f"status {response.status_code} on {endpoint}")
+        try:
+            return orjson.loads(response.content)
+        except ValueError as e:
+            raise APIError(f"Invalid response ({response.status_code}) from {endpoint}") from e
+
+    def _send(self, method, url, payload=None, params=None):
+        self.limiter.acquire()
+        started = time.monotonic()
+        data = None if payload is None else encode(payload)
+        try:
+            response = self.session.request(method, url=url, data=data, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.limiter.failure(type(e).__name__)
+            raise
+        self._track(response, started)
+        return response
+
+    def get(self, endpoint, params=None):
+        return self._call("GET", endpoint, params=params, parse=self._json)
+
     def post(self, endpoint, payload):
-        endpoint = self._build(endpoint)
-        response = requests.post(url=endpoint, json=payload, auth=self.auth, headers=self.headers)
-        return response.json()
+        return self._call("POST", endpoint, payload=payload, parse=self._import_result)
+
+    def _call(self, method, endpoint, payload=None, params=None, parse=None):
+        breaker = self._allow(endpoint)
+        try:
+            result = self._request(method, endpoint, payload=payload, params=params, parse=parse)
+        except BaseException as e:
+            self._settle(endpoint, breaker, e)
+        breaker.success()
+        return result
+
+    def _request(self, method, endpoint, payload=None, params=None, parse=None):
+        url = self._build(endpoint)
+        attempt = 0
+        while True:
+            try:
+                response = self._send(method, url, payload=payload, params=params)
+            except self.transport_errors as e:
+                reason = self._reason(endpoint, error=e)
+            else:
+                reason = self._reason(endpoint, response=response)
+                if reason is None:
+                    return parse(endpoint, response)
+            time.sleep(self._backoff(endpoint, attempt, reason))
+            attempt += 1
+
+    # Circuit breaking and retries shared by both transports
+
+    def _allow(self, endpoint):
+        breaker = self._breaker(endpoint)
+        if not breaker.allow():
+            raise self._unavailable(endpoint, breaker)
+        return breaker
+
+    def _settle(self, endpoint, breaker, error):
+        # Reports a failed call to its breaker and raises what the caller sees
+        if isinstance(error, UnavailableError):
+            breaker.failure()
+            if breaker.is_open:
+                # The row that tripped the circuit waits for recovery with the rest
+                raise self._unavailable(endpoint, breaker) from error
+        elif isinstance(error, APIError):
+            # DHIS2 answered, if not as hoped, so the endpoint is up
+            breaker.success()
+        else:
+            # Anything else, cancellation included, must not leave a probe pending
+            breaker.failure()
+        raise error
+
+    def _reason(self, endpoint, response=None, error=None):
+        # Why a request is worth another attempt, None when its answer is final
+        if error is not None:
+            if isinstance(error, self.transient_errors):
+                return type(error).__name__
+            raise APIError(f"{type(error).__name__} on {endpoint}") from error
+        if self._retryable(response):
+            return f"status {response.status_code}"
+        return None
+
+    def _backoff(self, endpoint, attempt, reason):
+        delay = self.retry.delay(attempt)
+        if delay is None:
+            raise UnavailableError(f"{reason} on {endpoint}")
+        logger.warning(f"Retrying {endpoint} in {delay:.1f}s after {reason}")
+        return delay
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncAPI(API):
+    # Bound to the event loop it was opened in, so it is not a
+    # per-process singleton: open one per run with `async with`.
+
+    transport_errors = httpx.HTTPError
+    transient_errors = httpx.TransportError
+
+    def _create_session(self):
+        keep_alive = self.pool_size if self.keep_alive else 0
+        limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=keep_alive)
+        return httpx.AsyncClient(
+            auth=(self.api_username, self.api_password),
+            headers=self.headers,
+            limits=limits,
+            timeout=self.timeout,
+        )
+
+    async def _send(self, method, url, payload=None, params=None):
+        await asyncio.sleep(self.limiter.reserve())
+        started = time.monotonic()
+        content = None if payload is None else encode(payload)
+        try:
+            response = await self.session.request(method, url=url, content=content, params=params)
+        except httpx.HTTPError as e:
+            self.limiter.failure(type(e).__name__)
+            raise
+        self._track(response, started)
+        return response
+
+    async def get(self, endpoint, params=None):
+        return await self._call("GET", endpoint, params=params, parse=self._json)
+
+    async def post(self, endpoint, payload):
+        return await self._call("POST", endpoint, payload=payload, parse=self._import_result)
+
+    async def _call(self, method, endpoint, payload=None, params=None, parse=None):
+        breaker = self._allow(endpoint)
+        try:
+            result = await self._request(method, endpoint, payload=payload, params=params, parse=parse)
+        except BaseException as e:
+            self._settle(endpoint, breaker, e)
+        breaker.success()
+        return result
+
+    async def _request(self, method, endpoint, payload=None, params=None, parse=None):
+        url = self._build(endpoint)
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(method, url, payload=payload, params=params)
+            except self.transport_errors as e:
+                reason = self._reason(endpoint, error=e)
+            else:
+                reason = self._reason(endpoint, response=response)
+                if reason is None:
+                    return parse(endpoint, response)
+            await asyncio.sleep(self._backoff(endpoint, attempt, reason))
+            attempt += 1
+
+    async def close(self):
+        await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+def event_template(program, stage):
+    return Template(
+        ["orgUnit", "eventDate", "trackedEntityInstance", "event", "enrollment", "dataValues"],
+        constants={"program": program, "status": "COMPLETED", "programStage": stage},
+    )
+
 
 class Namis:
 
     entity_type = "JXqDBe1cNcL" # Farmer
     program = "Y4g6aGReECE" # Farm Household Register
+    national_id_attribute = "W6kJs5es1rY" # NationalID
     household_stage= "AS1r4HWv36F" # Program Stage ID
     farming_overview_stage = "bKtLxsPhyQF" # Program Stage ID
     farming_method_stage = "GDCkEHh2rrP" # Program Stage ID
     support_stage = "iAE7BP6fBXf" # Program Stage ID
 
+    # Program stages in the order their events are sent, with their data elements
+    stages = [
+        (household_stage, HOUSEHOLD_DEMOGRAPHICS),
+        (farming_overview_stage, FARMING_OVERVIEW),
+        (support_stage, SUPPORT),
+        (farming_method_stage, FARMING_METHOD),
+    ]
+
+    # Pre-serialized request bodies, only the per-row values are encoded on post
+    profile_template = Template(["trackedEntityInstance", "trackedEntityType", "orgUnit", "attributes"])
+    event_templates = {
+        household_stage: event_template(program, household_stage),
+        farming_overview_stage: event_template(program, farming_overview_stage),
+        support_stage: event_template(program, support_stage),
+        farming_method_stage: event_template(program, farming_method_stage),
+    }
+
     profile_endpoint = "trackedEntityInstances"
     enrollment_endpoint = "enrollments"
     events_endpoint = "events"
 
     error = None
 
-    def __init__(self, record) -> None:
+    def __init__(self, record, api=None, farmer=None, seed=None) -> None:
         self.record = record
-        self.api = API()
-
-    def _dict_to_object(self, data):
-        return json.loads(json.dumps(data), object_hook=lambda d: SimpleNamespace(**d))
+        self.api = api or API.instance()
+        self.uids = self._generate_uids(record, seed)
+        self.entity_instance = None
+        # Stages already accepted by DHIS2, a repeated post() resumes after them
+        self.completed = set()
+        # Values DHIS2 has for an adopted farmer, by "profile" or stage
+        self.known = {}
+        if farmer:
+            self._adopt(farmer)
+
+    def _adopt(self, farmer):
+        # A farmer DHIS2 already has is updated in place: its own uids are
+        # reused, which DHIS2 imports as updates, and the parts that did not
+        # change count as completed so they are not sent again
+        self.entity_instance = self.uids["trackedEntityInstance"] = farmer.reference
+        self.known["profile"] = farmer.attributes
+        if not self._differs(PROFILE, farmer.attributes):
+            self.completed.add("profile")
+        if farmer.enrollment:
+            self.uids["enrollment"] = farmer.enrollment
+            self.completed.add("enrollment")
+        for stage, _ in self.stages:
+            if stage in farmer.events:
+                self.uids[stage], self.known[stage] = farmer.events[stage]
+        if all(
+            stage in farmer.events and not self._differs(mapping, farmer.events[stage][1])
+            for stage, mapping in self.stages
+        ):
+            self.completed.add("events")
+
+    def _differs(self, mapping, current):
+        # Whether the row has values for the file's columns that DHIS2 does not
+        return any(
+            field.column is not None and as_text(value) != current.get(field.uid, "")
+            for field, value in zip(mapping.fields, mapping.values(self.record))
+        )
+
+    @property
+    def unchanged(self):
+        return {"profile", "enrollment", "events"} <= self.completed
+
+    def _generate_uids(self, record, seed=None):
+        # Identifiers are fixed before anything is sent, so dependent requests
+        # need not wait for the server and a retried row cannot duplicate a farmer.
+        # Rows without a NationalID use `seed` instead, random when there is none.
+        national_id = (record.get("NationalID") or "").strip()
+        seed = national_id or seed
+        keys = ["trackedEntityInstance", "enrollment"] + [stage for stage, _ in self.stages]
+        return {key: generate_uid(f"{seed}:{key}" if seed else None) for key in keys}
 
     def _get_current_date(self):
         current_datetime = datetime.now()
         return current_datetime.strftime("%Y-%m-%d")
 
-    def _post_profile(self, entity_type, org_unit, data):
-        payload = {
+    def _profile_payload(self, entity_type, org_unit, data):
+        return {
+            "trackedEntityInstance": self.uids["trackedEntityInstance"],
             "trackedEntityType": entity_type,
             "orgUnit": org_unit,
-            "attributes": [
-                {
-                    "displayName": "SerialNumber",
-                    "attribute": "c3aKgEhckfB",
-                    "value": None
-                },
-                {
-                    "displayName": "NationalIDQRCode",
-                    "attribute": "bGCIwhx0QWQ",
-                    "value": str(data["NationalIDQRCode"])
-                },
-                {
-                    "displayName": "NationalID",
-                    "attribute": "W6kJs5es1rY",
-                    "value": str(data["NationalID"])
-                },
-                {
-                    "displayName": "HouseholdHead",
-                    "attribute": "znJuOdk5Cdl",
-                    "value": str(data["HouseholdHead"])
-                },
-                {
-                    "displayName": "Birthday",
-                    "attribute": "gEjOqoZAviX",
-                    "value": data["Birthday"]
-                },
-                {
-                    "displayName": "Sex",
-                    "attribute": "ij3vRdw9lju",
-                    "value": str(data["Sex"])
-                },
-                {
-                    "displayName": "PhoneNumber",
-                    "attribute": "fdrAPSn6xfz",
-                    "value": str(data["PhoneNumber"])
-                },
-                {
-                    "displayName": "PhoneType",
-                    "attribute": "tL4Iss9KsVC",
-                    "value": str(data["PhoneType"])
-                },
-                {
-                    "displayName": "Education",
-                    "attribute": "Qi0SsrtddJp",
-                    "value": str(data["Education"])
-                },
-                {
-                    "displayName": "Occupation",
-                    "attribute": "vjeRjLGKjHV",
-                    "value": str(data["Occupation"])
-                },
-
-                {
-                    "displayName": "HeadCondition",
-                    "attribute": "aJEyk9gIxcr",
-                    "value": str(data["HeadCondition"])
-                },
-                {
-                    "displayName": "HouseholdCoordinates",
-                    "attribute": "EHBa25SkWJg",
-                    "value": None
-                },
-                {
-                    "displayName": "ADD",
-                    "attribute": "EW2GONAplcf",
-                    "value": str(data["ADD"])
-                },
-                {
-                    "displayName": "District",
-                    "attribute": "SuWgGzt14Je",
-                    "value": str(data["District"])
-                },
-                {
-                    "displayName": "Constituency",
-                    "attribute": "GcB2oLrzWqb",
-                    "value": str(data["Constituency"])
-                },
-                {
-                    "displayName": "TA",
-                    "attribute": "xRmOhRvfniD",
-                    "value": str(data["TA"])
-                },
-                {
-                    "displayName": "GVH",
-                    "attribute": "HmENbD9wbaf",
-                    "value": str(data["GVH"])
-                },
-                {
-                    "displayName": "NearestAdmarc",
-                    "attribute": "ffoDQT1tJfz",
-                    "value": str(data["NearestAdmarc"])
-                },
-                {
-                    "displayName": "NearestMarket",
-                    "attribute": "QEzPjaQKA54",
-                    "value": str(data["NearestMarket"])
-                }
-            ]
+            "attributes": PROFILE.build(data, self.known.get("profile")),
         }
-        response = self.api.post(self.profile_endpoint, payload)
-        result  = JsonObject(response)
-        reference = result.response.importSummaries[0].reference
-        if reference:
-            return reference
-        else:
-            self.error = response['response']['importSummaries'][0]['conflicts'][0]['value']
 
-    def _post_enrollment(self, entity_instance, org_unit):
+    def _profile_body(self, entity_type, org_unit, data):
+        return self.profile_template.render(
+            self.uids["trackedEntityInstance"], entity_type, org_unit, PROFILE.encode(data, self.known.get("profile")),
+        )
+
+    def _reference(self, result):
+        if result.reference and not result.error:
+            return result.reference
+        self.error = result.error or "Profile was not created"
+
+    def _complete(self, stage, result):
+        if result.error:
+            self.error = result.error
+            return False
+        self.completed.add(stage)
+        return True
+
+    def _enrollment_payload(self, entity_instance, org_unit):
         current_date = self._get_current_date()
 
-        payload = {
+        return {
+            "enrollment": self.uids["enrollment"],
             "trackedEntityInstance": entity_instance,
             "program": self.program,
             "orgUnit": org_unit,
             "enrollmentDate": current_date,
             "incidentDate": current_date
          }
-        return self.api.post(self.enrollment_endpoint, payload)
-
-    def _post_household_demographics(self, entity_instance, org_unit, data):
-        current_date = self._get_current_date()
 
-        payload = {
+    def _event_payload(self, stage, mapping, entity_instance, org_unit, event_date, data):
+        return {
             "program": self.program,
             "orgUnit": org_unit,
-            "eventDate": current_date,
+            "eventDate": event_date,
             "status": "COMPLETED",
             "trackedEntityInstance": entity_instance,
-            "programStage": self.household_stage,
-            "dataValues": [
-                {
-                    "displayName": "HouseholdSize",
-                    "dataElement": "V9ohTgE9gt6",
-                    "value": str(data["HouseholdSize"])
-                },
-
-                {
-                    "displayName": "UnderFiveChildren",
-                    "dataElement": "LODyndrVqqy",
-                    "value": str(data["UnderFiveChildren"])
-                },
-
-                {
-                    "displayName": "FarmingParticipants",
-                    "dataElement": "sdhYSHX6ADi",
-                    "value": str(data["FarmingParticipants"])
-                },
-
-                {
-                    "displayName": "Disabilities",
-                    "dataElement": "lUj8KABoecG",
-                    "value": str(data["Disabilities"])
-                },
-
-                {
-                    "displayName": "FarmingIncome",
-                    "dataElement": "jhsAI5u7Qtz",
-                    "value": str(data["FarmingIncome"])
-                },
-
-                {
-                    "displayName": "OverallIncome",
-                    "dataElement": "wFBmGcv8oD5",
-                    "value": str(data["OverallIncome"])
-                },
-
-                {
-                    "displayName": "MaritalStatus",
-                    "dataElement": "cxGvtTqFZRg",
-                    "value": str(data["MaritalStatus"])
-                },
-
-                {
-                    "displayName": "PrimaryIncomeSource",
-                    "dataElement": "RY1Sjzog4uV",
-                    "value": str(data["PrimaryIncomeSource"])
-                },
-
-                {
-                    "displayName": "SpouseName",
-                    "dataElement": "gESUD9F82QZ",
-                    "value": str(data["SpouseName"])
-                },
-
-                {
-                    "displayName": "SpouseNationalIDQRCode",
-                    "dataElement": "f69kxpGfwar",
-                    "value": None
-                },
-
-                {
-                    "displayName": "SpouseNationalID",
-                    "dataElement": "Qh0LStKoviT",
-                    "value": None
-                },
-
-                {
-                    "displayName": "SpouseBirthday",
-                    "dataElement": "uE408f0Mjlv",
-                    "value": None
-                }
-
-            ]
+            "programStage": stage,
+            "dataValues": mapping.build(data, self.known.get(stage)),
+            "event": self.uids[stage],
+            "enrollment": self.uids["enrollment"],
         }
 
-        return self.api.post(self.events_endpoint, payload)
-
-    def _post_farming_overview(self, entity_instance, org_unit, data):
-        current_date = self._get_current_date()
+    def _event_payloads(self, entity_instance, org_unit, data):
+        event_date = self._get_current_date()
+        return [
+            self._event_payload(stage, mapping, entity_instance=entity_instance, org_unit=org_unit, event_date=event_date, data=data)
+            for stage, mapping in self.stages
+        ]
+
+    def _events_body(self, entity_instance, org_unit, data):
+        event_date = self._get_current_date()
+        enrollment = self.uids["enrollment"]
+        events = [
+            self.event_templates[stage].render(
+                org_unit, event_date, entity_instance, self.uids[stage], enrollment,
+                mapping.encode(data, self.known.get(stage)),
+            )
+            for stage, mapping in self.stages
+        ]
+        return b'{"events":[' + b",".join(events) + b"]}"
 
-        payload = {
-            "program": self.program,
-            "orgUnit": org_unit,
-            "eventDate": current_date,
-            "status": "COMPLETED",
-            "trackedEntityInstance": entity_instance,
-            "programStage": self.farming_overview_stage,
-            "dataValues": [
-                {
-                    "displayName": "FarmerGroupMember",
-                    "dataElement": "QqwVUXU3hGd",
-                    "value": to_bool(data["FarmerGroup"])
-                },
-
-                {
-                    "displayName": "FarmerGroupName",
-                    "dataElement": "YhGb4g7jTSA",
-                    "value": str(data["FarmerGroupName"])
-                },
-
-                {
-                    "displayName": "RentedLandSize",
-                    "dataElement": "cpEikdJudnS",
-                    "value": None
-                },
-
-                {
-                    "displayName": "PermanentLandSize",
-                    "dataElement": "aVI6OByBS4R",
-                    "value": None
-                },
-
-                {
-                    "displayName": "MaiFieldGPS",
-                    "dataElement": "v3Yo1rNuGwq",
-                    "value": None
-                },
-
-                {
-                    "displayName": "LandLegalStatus",
-                    "dataElement": "fmUHqcHA8T7",
-                    "value": None
-                },
-
-                {
-                    "displayName": "TotalLandSize",
-                    "dataElement": "aNCtzVQCjK4",
-                    "value": str(data["TotalLandSize"])
-                }
-            ]
-        }
-        return self.api.post(self.events_endpoint, payload)
+    def _post_profile(self, entity_type, org_unit, data):
+        payload = self._profile_body(entity_type=entity_type, org_unit=org_unit, data=data)
+        result = self.api.post(self.profile_endpoint, payload)
+        return self._reference(result)
 
-    def _post_support(self, entity_instance, org_unit, data):
-        current_date = self._get_current_date()
+    def _post_enrollment(self, entity_instance, org_unit):
+        payload = self._enrollment_payload(entity_instance=entity_instance, org_unit=org_unit)
+        return self.api.post(self.enrollment_endpoint, payload)
 
-        payload = {
-            "program": self.program,
-            "orgUnit": org_unit,
-            "eventDate": current_date,
-            "status": "COMPLETED",
-            "trackedEntityInstance":entity_instance,
-            "programStage": self.support_stage,
-            "dataValues": [
-                {
-                    "displayName": "CreditService",
-                    "dataElement": "wJlsR1WLgbO",
-                    "value": to_bool(data["CreditService"])
-                },
-
-                {
-                    "displayName": "CreditServiceProvider",
-                    "dataElement": "xy26yMuqVC8",
-                    "value": str(data["CreditServiceProvider"])
-                },
-
-
-                {
-                    "displayName": "Extension_FaceToFace",
-                    "dataElement": "QXL27V3TVYU",
-                    "value": to_bool(data["Extension_FaceToFace"])
-                },
-                {
-                    "displayName": "Extension_SocialMedia",
-                    "dataElement": "OK7D6F0QUUS",
-                    "value": to_bool(data["Extension_SocialMedia"])
-                },
-                {
-                    "displayName": "Extension_Radios",
-                    "dataElement": "LS007281CI9",
-                    "value": to_bool(data["Extension_Radios"])
-                },
-                {
-                    "displayName": "Extension_Posters",
-                    "dataElement": "WER8M7KU1B7",
-                    "value": to_bool(data["Extension_Posters"])
-                },
-                {
-                    "displayName": "Extension_FellowFarmers",
-                    "dataElement": "DNW7A591194",
-                    "value": to_bool(data["Extension_FellowFarmers"])
-                },
-                {
-                    "displayName": "Extension_AgroSuppliers",
-                    "dataElement": "MFV29UFT85W",
-                    "value": to_bool(data["Extension_AgroSuppliers"])
-                },
-
-                {
-                    "displayName": "PreferredMode_FaceToFace",
-                    "dataElement": "KYIG1490L46",
-                    "value": to_bool(data["PreferredMode_FaceToFace"])
-                },
-                {
-                    "displayName": "PreferredMode_SocialMedia",
-                    "dataElement": "YHHTQ18U4XO",
-                    "value": to_bool(data["PreferredMode_SocialMedia"])
-                },
-                {
-                    "displayName": "PreferredMode_Radios",
-                    "dataElement": "VATJC3AVWA0",
-                    "value": to_bool(data["PreferredMode_Radios"])
-                },
-                {
-                    "displayName": "PreferredMode_Posters",
-                    "dataElement": "EYH70MDZT88",
-                    "value": to_bool(data["PreferredMode_Posters"])
-                },
-                {
-                    "displayName": "PreferredMode_FellowFarmers",
-                    "dataElement": "HM27I955MNO",
-                    "value": to_bool(data["PreferredMode_FellowFarmers"])
-                },
-                {
-                    "displayName": "PreferredMode_AgroSuppliers",
-                    "dataElement": "RO9J6CV17MU",
-                    "value": to_bool(data["PreferredMode_AgroSuppliers"])
-                },
-
-                {
-                    "displayName": "ReceiptOfSupport",
-                    "dataElement": "jVcTS9kdNwU",
-                    "value": to_bool(data["ReceiptOfSupport"])
-                },
-                {
-                    "displayName": "SourceOfSupport",
-                    "dataElement": "OyIgAUaoduw",
-                    "value": str(data["SourceOfSupport"])
-                },
-                {
-                    "displayName": "SupportOrganization",
-                    "dataElement": "WLn93SWcfRV",
-                    "value": str(data["SupportOrganization"])
-                },
-                {
-                    "displayName": "SupportDuration",
-                    "dataElement": "QYlx3R6TQ2q",
-                    "value": str(data["SupportDuration"])
-                },
-                {
-                    "displayName": "Support_Cash",
-                    "dataElement": "UWH170UE2H6",
-                    "value": to_bool(data["Support_Cash"])
-                },
-                {
-                    "displayName": "Support_Seeds",
-                    "dataElement": "KZ9499349G4",
-                    "value": to_bool(data["Support_Seeds"])
-                },
-                {
-                    "displayName": "Support_Fertilizer",
-                    "dataElement": "AP0P42X1X24",
-                    "value":  to_bool(data["Support_Fertilizer"])
-                },
-                {
-                    "displayName": "Support_ExtensionService",
-                    "dataElement": "NCIZGNQ69IX",
-                    "value":  to_bool(data["Support_ExtensionService"])
-                },
-                {
-                    "displayName": "Support_Livestock",
-                    "dataElement": "SI34R4K3YLL",
-                    "value":  to_bool(data["Support_Livestock"])
-                },
-                {
-                    "displayName": "Support_LandManagement",
-                    "dataElement": "VN40U24X7TM",
-                    "value":  to_bool(data["Support_LandManagement"])
-                },
-                {
-                    "displayName": "Support_Nutrition",
-                    "dataElement": "FM7H5Z11ZRH",
-                    "value":  to_bool(data["Support_Nutrition"])
-                },
-                {
-                    "displayName": "ReceiptOfExtraSupport",
-                    "dataElement": "YsUioHiJjfg",
-                    "value":  to_bool(data["ReceiptOfExtraSupport"])
-                },
-                {
-                    "displayName": "SourceOfExtraSupport",
-                    "dataElement": "myv9cIOKZKe",
-                    "value":  None
-                },
-                {
-                    "displayName": "ExtraSupportOrganization",
-                    "dataElement": "FCp7LyZF4yN",
-                    "value":  str(data["ExtraSupportOrganization"])
-                },
-                {
-                    "displayName": "ExtraSupportDuration",
-                    "dataElement": "IuOQR1VnCYw",
-                    "value":  str(data["ExtraSupportDuration"])
-                },
-                {
-                    "displayName": "ExtraSupport_Cash",
-                    "dataElement": "YMV5FN1JW6H",
-                    "value":  to_bool(data["ExtraSupport_Cash"])
-                },
-                {
-                    "displayName": "ExtraSupport_Seeds",
-                    "dataElement": "HN42ASU8USI",
-                    "value":  to_bool(data["ExtraSupport_Seeds"])
-                },
-                {
-                    "displayName": "ExtraSupport_Fertilizer",
-                    "dataElement": "ZRQP7E5U1WG",
-                    "value":  to_bool(data["ExtraSupport_Fertilizer"])
-                },
-                {
-                    "displayName": "ExtraSupport_ExtensionService",
-                    "dataElement": "SJPSQ28ET7U",
-                    "value":  to_bool(data["ExtraSupport_ExtensionService"])
-                },
-                {
-                    "displayName": "ExtraSupport_Livestock",
-                    "dataElement": "LD1KT343F5T",
-                    "value":  to_bool(data["ExtraSupport_Livestock"])
-                },
-                {
-                    "displayName": "ExtraSupport_LandManagement",
-                    "dataElement": "SO3326C6N4G",
-                    "value":  to_bool(data["ExtraSupport_LandManagement"])
-                },
-                {
-                    "displayName": "ExtraSupport_Nutrition",
-                    "dataElement": "CHSTCBKLX69",
-                    "value":  to_bool(data["ExtraSupport_Nutrition"])
-                }
-
-
-            ]
-        }
+    def _post_events(self, entity_instance, org_unit, data):
+        payload = self._events_body(entity_instance=entity_instance, org_unit=org_unit, data=data)
         return self.api.post(self.events_endpoint, payload)
 
-    def _post_farming_method(self, entity_instance, org_unit, data):
-        current_date = self._get_current_date()
-        payload = {
-            "program": self.program,
-            "orgUnit": org_unit,
-            "eventDate": current_date,
-            "status": "COMPLETED",
-            "trackedEntityInstance": entity_instance,
-            "programStage": self.farming_method_stage,
-            "dataValues": [
-                {
-                    "displayName": "UseIrrigation",
-                    "dataElement": "r0IkPiagdvQ",
-                    "value": to_bool(data["UseIrrigation"])
-                },
-
-                {
-                    "displayName": "IrrigationType",
-                    "dataElement": "CXYfteuVgcQ",
-                    "value": str(data["IrrigationType"])
-                },
-                {
-                    "displayName": "IrrigationMethod",
-                    "dataElement": "EK8O4uHpm28",
-                    "value": str(data["IrrigationMethod"])
-                },
-                {
-                    "displayName": "EnergySource",
-                    "dataElement": "tB4VCxeipsv",
-                    "value": str(data["EnergySource"])
-                },
-                {
-                    "displayName": "WaterSource",
-                    "dataElement": "GhFwhm9aVTG",
-                    "value": str(data["WaterSource"])
-                },
-                {
-                    "displayName": "SurfaceWaterSource",
-                    "dataElement": "DDPpFvAgQ06",
-                    "value": str(data["SurfaceWaterSource"])
-                },
-                {
-                    "displayName": "SubsurfaceWaterSource",
-                    "dataElement": "ejvXcsevL6X",
-                    "value": str(data["SubsurfaceWaterSource"])
-                },
-                {
-                    "displayName": "EnterpriseType",
-                    "dataElement": "VlXtRS3X8vg",
-                    "value": str(data["EnterpriseType"])
-                },
-                {
-                    "displayName": "Maize",
-                    "dataElement": "GUvE51AL6sI",
-                    "value": to_bool(data["Maize"])
-                },
-                {
-                    "displayName": "Millet",
-                    "dataElement": "m2k52GtcsEv",
-                    "value": to_bool(data["Millet"])
-                },
-                {
-                    "displayName": "Okra",
-                    "dataElement": "BwCQIRjaNKt",
-                    "value": to_bool(data["Okra"])
-                },
-                {
-                    "displayName": "Onions",
-                    "dataElement": "jqAOwrpHG6J",
-                    "value": to_bool(data["Onions"])
-                },
-                {
-                    "displayName": "Papaya",
-                    "dataElement": "zoskEfLmDA4",
-                    "value": to_bool(data["Papaya"])
-                },
-                {
-                    "displayName": "PigeonPeas",
-                    "dataElement": "Lb70D9e8Cvz",
-                    "value": to_bool(data["PigeonPeas"])
-                },
-                {
-                    "displayName": "Pineapple",
-                    "dataElement": "f6Q8V7FOFHK",
-                    "value": to_bool(data["Pineapple"])
-                },
-                {
-                    "displayName": "Pumpkin",
-                    "dataElement": "oGlMqxJZTCU",
-                    "value": to_bool(data["Pumpkin"])
-                },
-                {
-                    "displayName": "Rice",
-                    "dataElement": "QyMKnDBNcbu",
-                    "value": to_bool(data["Rice"])
-                },
-                {
-                    "displayName": "Sesame",
-                    "dataElement": "VrvMIi1hUpo",
-                    "value": to_bool(data["Sesame"])
-                },
-                {
-                    "displayName": "Sorghum",
-                    "dataElement": "CZFVe8qyIsM",
-                    "value": to_bool(data["Sorghum"])
-                },
-                {
-                    "displayName": "Soyabean",
-                    "dataElement": "dGrPZZUxWCo",
-                    "value": to_bool(data["Soyabean"])
-                },
-                {
-                    "displayName": "Sugarcane",
-                    "dataElement": "UnBHTZiHPWH",
-                    "value": to_bool(data["Sugarcane"])
-                },
-                {
-                    "displayName": "Sunflower",
-                    "dataElement": "ePrhycaXAKN",
-                    "value": to_bool(data["Sunflower"])
-                },
-                {
-                    "displayName": "SweetPotato",
-                    "dataElement": "HK4bZn7FpQL",
-                    "value": to_bool(data["SweetPotato"])
-                },
-                {
-                    "displayName": "Tomatoes",
-                    "dataElement": "Ks0MuqEbwa3",
-                    "value": to_bool(data["Tomatoes"])
-                },
-                {
-                    "displayName": "Wheat",
-                    "dataElement": "RXIclGKl3uq",
-                    "value": to_bool(data["Wheat"])
-                },
-                {
-                    "displayName": "MainFoodCropOutput",
-                    "dataElement": "pg4jYMQwUPA",
-                    "value": str(data["MainFoodCropOutput"])
-                },
-                {
-                    "displayName": "Pestcontrol_Fungicides",
-                    "dataElement": "LQ72O792KNB",
-                    "value": to_bool(data["Pestcontrol_Fungicides"])
-                },
-                {
-                    "displayName": "Pestcontrol_Rodenticides",
-                    "dataElement": "VL74L2S4K7I",
-                    "value": to_bool(data["Pestcontrol_Rodenticides"])
-                },
-                {
-                    "displayName": "Pestcontrol_Insecticides",
-                    "dataElement": "TR34G1G970S",
-                    "value": to_bool(data["Pestcontrol_Insecticides"])
-                },
-                {
-                    "displayName": "Pestcontrol_Molluscicides",
-                    "dataElement": "MM9529F1695",
-                    "value": to_bool(data["Pestcontrol_Molluscicides"])
-                },
-                {
-                    "displayName": "Pestcontrol_Herbicides",
-                    "dataElement": "MAJ86DJ210P",
-                    "value": to_bool(data["Pestcontrol_Herbicides"])
-                },
-                {
-                    "displayName": "Pestcontrol_BiologicalMethods",
-                    "dataElement": "DK7G9XYY3O1",
-                    "value": to_bool(data["Pestcontrol_BiologicalMethods"])
-                },
-                {
-                    "displayName": "Pestcontrol_TraditionalMethods",
-                    "dataElement": "GIC4WU397A9",
-                    "value": to_bool(data["Pestcontrol_TraditionalMethods"])
-                },
-
-                {
-                    "displayName": "Fertilizer_NPK",
-                    "dataElement": "VF57Y1H90RR",
-                    "value": to_bool(data["Fertilizer_NPK"])
-                },
-                {
-                    "displayName": "Fertilizer_Urea",
-                    "dataElement": "ONO7YG2DE45",
-                    "value": to_bool(data["Fertilizer_Urea"])
-                },
-                {
-                    "displayName": "Fertilizer_DAP",
-                    "dataElement": "YZ94AP6367R",
-                    "value": to_bool(data["Fertilizer_DAP"])
-                },
-                {
-                    "displayName": "Fertilizer_OrganicManure",
-                    "dataElement": "PD7M4XH7V1B",
-                    "value": to_bool(data["Fertilizer_OrganicManure"])
-                },
-                {
-                    "displayName": "Fertilizer_Hybrid",
-                    "dataElement": "XUR592HS474",
-                    "value": to_bool(data["Fertilizer_Hybrid"])
-                },
-                {
-                    "displayName": "Fertilizer_SulphateOfAmmonium",
-                    "dataElement": "XPT97TXC41K",
-                    "value": to_bool(data["Fertilizer_SulphateOfAmmonium"])
-                },
-                {
-                    "displayName": "Fertilizer_CAN",
-                    "dataElement": "NNNIR789V4A",
-                    "value": to_bool(data["Fertilizer_CAN"])
-                },
-                {
-                    "displayName": "Fertilizer_SuperD",
-                    "dataElement": "AD3W70P32Y1",
-                    "value": to_bool(data["Fertilizer_SuperD"])
-                },
-                {
-                    "displayName": "Fertilizer_DCompound",
-                    "dataElement": "UR897V0HG36",
-                    "value": to_bool(data["Fertilizer_DCompound"])
-                },
-
-                {
-                    "displayName": "SeedMultiplication",
-                    "dataElement": "VG27WiA9zd1",
-                    "value": to_bool(data["SeedMultiplication"])
-                },
-                {
-                    "displayName": "KeepLivestock",
-                    "dataElement": "fn0M0La8dyl",
-                    "value": to_bool(data["KeepLivestock"])
-                },
-                {
-                    "displayName": "MainPastureLand",
-                    "dataElement": "ejvXcsevL6X",
-                    "value": str(data["MainPastureLand"])
-                },
-                {
-                    "displayName": "Cattle",
-                    "dataElement": "u43vGnAw8Wa",
-                    "value": to_bool(data["Cattle"])
-                },
-                {
-                    "displayName": "Goat",
-                    "dataElement": "V4afoGT13Ko",
-                    "value": to_bool(data["Goat"])
-                },
-                {
-                    "displayName": "Bees",
-                    "dataElement": "wkrIjG5Wlzq",
-                    "value": to_bool(data["Bees"])
-                },
-                {
-                    "displayName": "Chicken",
-                    "dataElement": "gseaJTN0Ez1",
-                    "value": to_bool(data["Chicken"])
-                },
-                {
-                    "displayName": "Ducks",
-                    "dataElement": "Ew9OkncLxzt",
-                    "value": to_bool(data["Ducks"])
-                },
-                {
-                    "displayName": "GuineaFowls",
-                    "dataElement": "OoUdxiz4jgP",
-                    "value": to_bool(data["GuineaFowls"])
-                },
-                {
-                    "displayName": "GuineaPigs",
-                    "dataElement": "QpoHNfefGs9",
-                    "value": to_bool(data["GuineaPigs"])
-                },
-                {
-                    "displayName": "Pigeon",
-                    "dataElement": "ZZfUJKi4pDQ",
-                    "value": to_bool(data["Pigeon"])
-                },
-                {
-                    "displayName": "Pigs",
-                    "dataElement": "pbJraIqWG7a",
-                    "value": to_bool(data["Pigs"])
-                },
-                {
-                    "displayName": "Quills",
-                    "dataElement": "b067T9mhtsF",
-                    "value": str(data["Quills"])
-                },
-                {
-                    "displayName": "Rabbits",
-                    "dataElement": "KeGhTSbpM2P",
-                    "value": to_bool(data["Rabbits"])
-                },
-                {
-                    "displayName": "Sheep",
-                    "dataElement": "IIHE7akabKi",
-                    "value": to_bool(data["Sheep"])
-                },
-                {
-                    "displayName": "Turkey",
-                    "dataElement": "Vi1V5duySTC",
-                    "value": to_bool(data["Turkey"])
-                },
-                {
-                    "displayName": "FishFarmingPractice",
-                    "dataElement": "NlDVmTM0Xne",
-                    "value": to_bool(data["FishFarmingPractice"])
-                },
-                {
-                    "displayName": "FishFarmingPurpose",
-                    "dataElement": "UvwWIPlR73A",
-                    "value": str(data["FishFarmingPurpose"])
-                },
-                {
-                    "displayName": "ProductionPurpose",
-                    "dataElement": "uzEJJETmBoM",
-                    "value": None
-                },
-                {
-                    "displayName": "LabourSource",
-                    "dataElement": "s6uNwAugtU5",
-                    "value": str(data["LabourSource"])
-                }
-            ]
-        }
+    def _nested_payload(self, entity_type, org_unit, data):
+        # Enrollment and events ride inside the profile, DHIS2 links them
+        # to the tracked entity instance it creates.
+        enrollment = self._enrollment_payload(entity_instance=None, org_unit=org_unit)
+        events = self._event_payloads(entity_instance=None, org_unit=org_unit, data=data)
+        for payload in [enrollment, *events]:
+            del payload["trackedEntityInstance"]
+        enrollment["events"] = events
 
-        return self.api.post(self.events_endpoint, payload)
+        payload = self._profile_payload(entity_type=entity_type, org_unit=org_unit, data=data)
+        payload["enrollments"] = [enrollment]
+        return payload
+
+    def payload(self):
+        return self._nested_payload(entity_type=self.entity_type, org_unit=self.record["Blocks"], data=self.record)
 
     def post(self):
         org_unit = self.record["Blocks"]
+        self.error = None
+
+        try:
+            if "profile" not in self.completed:
+                self.entity_instance = self._post_profile(entity_type=self.entity_type, org_unit=org_unit, data=self.record)
+                if not self.entity_instance:
+                    return None, self.error
+                self.completed.add("profile")
+
+            if "enrollment" not in self.completed:
+                result = self._post_enrollment(entity_instance=self.entity_instance, org_unit=org_unit)
+                if not self._complete("enrollment", result):
+                    return self.entity_instance, self.error
+
+            if "events" not in self.completed:
+                result = self._post_events(entity_instance=self.entity_instance, org_unit=org_unit, data=self.record)
+                self._complete("events", result)
+        except APIError as e:
+            self.error = str(e)
+        return self.entity_instance, self.error
+
 
-        entity_instance = self._post_profile(entity_type=self.entity_type, org_unit=org_unit, data=self.record)
+class NamisBatch:
+
+    profile_endpoint = Namis.profile_endpoint
+
+    def __init__(self, records, api=None, farmers=None, seeds=None) -> None:
+        self.records = records
+        self.api = api or API.instance()
+        self.farmers = farmers or [None] * len(records)
+        self.seeds = seeds or [None] * len(records)
+
+    def post(self):
+        batch = [
+            Namis(record, api=self.api, farmer=farmer, seed=seed)
+            for record, farmer, seed in zip(self.records, self.farmers, self.seeds)
+        ]
+        payload = {"trackedEntityInstances": [namis.payload() for namis in batch]}
+        try:
+            result = self.api.post(self.profile_endpoint, payload)
+        except APIError as e:
+            return [(None, str(e))] * len(self.records)
+
+        # DHIS2 answers with one import summary per instance, matched by the
+        # uid the instance was sent with. Summaries without a reference, such
+        # as rejected instances, fall back to the order sent.
+        summaries = result.summaries
+        referenced = {summary.reference: summary for summary in summaries if summary.reference}
+        ordered = len(summaries) == len(batch)
+        error = result.message or "Import summaries do not match the batch"
+        results = []
+        for position, namis in enumerate(batch):
+            summary = referenced.get(namis.uids["trackedEntityInstance"])
+            if summary is None and ordered and not summaries[position].reference:
+                summary = summaries[position]
+            results.append((summary.reference, summary.error) if summary else (None, error))
+        return results
+
+
+class AsyncNamis(Namis):
+
+    def __init__(self, record, api, farmer=None, seed=None) -> None:
+        super().__init__(record, api=api, farmer=farmer, seed=seed)
+
+    async def _post_profile(self, entity_type, org_unit, data):
+        payload = self._profile_body(entity_type=entity_type, org_unit=org_unit, data=data)
+        result = await self.api.post(self.profile_endpoint, payload)
+        return self._reference(result)
+
+    async def _post_enrollment(self, entity_instance, org_unit):
+        payload = self._enrollment_payload(entity_instance=entity_instance, org_unit=org_unit)
+        return await self.api.post(self.enrollment_endpoint, payload)
+
+    async def _post_events(self, entity_instance, org_unit, data):
+        payload = self._events_body(entity_instance=entity_instance, org_unit=org_unit, data=data)
+        return await self.api.post(self.events_endpoint, payload)
+
+    async def post(self):
+        org_unit = self.record["Blocks"]
+        self.error = None
+
+        try:
+            if "profile" not in self.completed:
+                self.entity_instance = await self._post_profile(entity_type=self.entity_type, org_unit=org_unit, data=self.record)
+                if not self.entity_instance:
+                    return None, self.error
+                self.completed.add("profile")
+
+            if "enrollment" not in self.completed:
+                result = await self._post_enrollment(entity_instance=self.entity_instance, org_unit=org_unit)
+                if not self._complete("enrollment", result):
+                    return self.entity_instance, self.error
+
+            if "events" not in self.completed:
+                result = await self._post_events(entity_instance=self.entity_instance, org_unit=org_unit, data=self.record)
+                self._complete("events", result)
+        except APIError as e:
+            self.error = str(e)
+        return self.entity_instance, self.error
+
+def send_completed_email(file_path, status='completed successfully', unchanged=0):
+    attachments = None
+    context = {
+        'file_name': os.path.basename(file_path),
+        'status': status,
+        'unchanged': unchanged,
+    }
+    subject = 'Data Post Completed'
+    template_name = 'integration/emails/import_complete.html'
+    send_email(subject, template_name, context=context, attachments=attachments)
 
-        self._post_enrollment(entity_instance=entity_instance, org_unit=org_unit)
-        self._post_household_demographics(entity_instance=entity_instance, org_unit=org_unit, data=self.record)
-        self._post_farming_overview(entity_instance=entity_instance, org_unit=org_unit, data=self.record)
-        self._post_support(entity_instance=entity_instance, org_unit=org_unit, data=self.record)
-        self._post_farming_method(entity_instance=entity_instance, org_unit=org_unit, data=self.record)
-        return entity_instance, self.error
 
 class Processor:
     posted_file = "logs/posted.csv"
     failed_file = "logs/failed.csv"
+    skipped_file = "logs/skipped.csv"
     log_file = "logs/errors.log"
+    workers = settings.NAMIS_WORKERS
+    # A chunk of a larger job processes rows start to stop (counted from 0)
+    # and leaves the summary and the email to the job. A shard's rows are
+    # numbered from `offset` rows into the file. Both record their rows to
+    # the ImportJob `job_id` of the whole file, which the job finishes.
+    binary = False
+    rows = None
+    offset = 0
+    job_id = None
+    summarize = True
+    notify = True
+
+    def __init__(self, workers=None):
+        if workers:
+            self.workers = workers
+        # Results waiting for earlier rows while posting is pooled
+        self.ordered = None
+        self.checkpoint = None
+        self.results = None
+        # Result files by path, open until the job ends
+        self.sinks = {}
+        self.source = None
+        # Set when the job is interrupted, for threads still posting rows
+        self.stopping = threading.Event()
+        self.api = API.instance()
+        self.api.retry.reset()
+        self.validator = self.normalizer = self.org_units = None
+        if settings.NAMIS_VALIDATE:
+            self._load_metadata()
+            self._load_org_units()
+        self.farmers = None
+        if settings.NAMIS_SKIP_EXISTING:
+            self.farmers = FarmerRegistry(
+                self.api,
+                Namis.program,
+                Namis.national_id_attribute,
+                settings.NAMIS_LOOKUP_BATCH_SIZE,
+                update=settings.NAMIS_UPSERT,
+            )
+        self.digests = DigestStore(settings.NAMIS_LOOKUP_BATCH_SIZE) if settings.NAMIS_DELTA else None
+        # (NationalID, hash) of rows in flight by row number, stored once they are posted
+        self.hashes = {}
+        self.unchanged = 0
+
+    def _load_metadata(self):
+        # Program metadata is fetched once per job; every row is translated to
+        # option codes and checked against it before anything is sent
+        try:
+            metadata = load_metadata(self.api, Namis.program)
+        except (APIError, CircuitOpenError) as e:
+            logger.warning(f"Rows will not be validated, metadata could not be loaded: {e}")
+            return
+        self.normalizer = Normalizer(metadata, PROFILE, Namis.stages)
+        self.validator = Validator(metadata, PROFILE, Namis.stages)
+
+    def _load_org_units(self):
+        try:
+            self.org_units = load_org_units(self.api)
+        except (APIError, CircuitOpenError) as e:
+            logger.warning(f"Blocks will be sent as they are, org units could not be loaded: {e}")
+
+    def _resolve(self, row):
+        block = row.get("Blocks")
+        if not block or not block.strip():
+            return row, None
+        uid = self.org_units.resolve(block, row.get("District"), row.get("TA"))
+        if uid is None:
+            return row, f"Blocks: '{block}' is not a known org unit"
+        return row.replace("Blocks", uid) if uid != block else row, None
+
+    def _prepare(self, row):
+        # The row as it is sent, or the reason it cannot be
+        if not isinstance(row, Row):
+            row = Row.from_dict(row)
+        if self.org_units:
+            row, error = self._resolve(row)
+            if error:
+                return row, error
+        if self.validator:
+            row = self.normalizer.normalize(row)
+            return row, self.validator.validate(row)
+        return row, None
+
+    def _summarize(self, file):
+        # Values no option matches, and those matched only by their spelling,
+        # are reported before the first row is sent
+        if not self.normalizer:
+            return
+        unmapped, fuzzy = self.normalizer.summarize(read_rows(file))
+        file.seek(0)
+        for column, values in unmapped.items():
+            listed = ", ".join(f"'{value}' ({count})" for value, count in values.most_common(10))
+            message = f"{column}: {sum(values.values())} rows with unmappable values: {listed}"
+            self._log(message)
+            logger.warning(message)
+        for column, values in fuzzy.items():
+            listed = ", ".join(f"'{value}' as '{code}' ({count})" for (value, code), count in values.most_common())
+            message = f"{column}: {sum(values.values())} rows with values matched by spelling: {listed}"
+            self._log(message)
+            logger.warning(message)
 
     def upload(self, filepath):
         logger.info("Process Initiated")
         with default_storage.open(filepath, mode='r') as file:
-            self._process(file)
+            self._run(file)
         logger.info("Process Completed")
 
     def read(self, filepath):
         logger.info("Process Initiated")
         with open(filepath, mode='r', newline='') as file:
-            self._process(file)
+            self._run(file)
+        logger.info("Process Completed")
+
+    def process(self, file):
+        # A file opened by the caller, in binary mode for processors reading bytes
+        logger.info("Process Initiated")
+        self._run(file)
         logger.info("Process Completed")
 
+    def _run(self, file):
+        self.stopping.clear()
+        self.source = str(file.name)
+        self.checkpoint = self._load_checkpoint(str(file.name)) if settings.NAMIS_CHECKPOINT else None
+        if settings.NAMIS_TRACK_RESULTS:
+            self.results = self._result_store(str(file.name))
+        previous = self._handle_sigterm()
+        try:
+            if self.summarize:
+                self._summarize(file)
+            self._process(file)
+        except BaseException:
+            # Killed, out of time or crashed: what was recorded is kept for the rerun
+            if self.digests:
+                self.digests.flush()
+            if self.results:
+                self._finish_results(ImportJob.Status.FAILED)
+            if self.checkpoint:
+                self.checkpoint.save()
+                logger.warning(f"Stopped, a rerun resumes after row {self.checkpoint.row}")
+            raise
+        finally:
+            self._close_sinks()
+            if previous is not None:
+                signal.signal(signal.SIGTERM, previous)
+        if self.digests:
+            self.digests.flush()
+        if self.results:
+            self._finish_results(ImportJob.Status.COMPLETED)
+        if self.checkpoint:
+            self.checkpoint.clear()
+        logger.info(f"Rows skipped as unchanged: {self.unchanged}")
+        if self.notify:
+            self._send_email(str(file.name))
+
+    def _finish_results(self, status):
+        # A job shared with other chunks or shards is finished by its owner
+        if self.job_id:
+            self.results.flush()
+        else:
+            self.results.finish(status)
+
+    def _result_store(self, name):
+        batch_size = settings.NAMIS_RESULT_BATCH_SIZE
+        if self.job_id:
+            return ResultStore(self.job_id, batch_size)
+        # A resumed run records to the job of the run it resumes
+        if self.checkpoint and self.checkpoint.job:
+            return ResultStore.resume(self.checkpoint.job, batch_size)
+        results = ResultStore.start(name, batch_size)
+        if self.checkpoint:
+            self.checkpoint.job = results.job_id
+        return results
+
+    def _flush_recorded(self):
+        # Whatever the checkpoint counts as recorded is written out before it is saved
+        if self.digests:
+            self.digests.flush()
+        if self.results:
+            self.results.flush()
+        for sink in self.sinks.values():
+            sink.flush()
+
+    def _load_checkpoint(self, name):
+        # A job is the file and the part of it this processor posts
+        first = self.offset + (self.rows[0] if self.rows else 0)
+        checkpoint = Checkpoint.load(
+            f"{name}:{self.rows}:{self.offset}", first, settings.NAMIS_CHECKPOINT_ROWS, flush=self._flush_recorded
+        )
+        if checkpoint.resumed:
+            logger.info(f"Resuming after row {checkpoint.row}, {len(checkpoint.done)} later rows already recorded")
+        return checkpoint
+
+    def _handle_sigterm(self):
+        # SIGTERM becomes SystemExit, which leaves through _run and saves the
+        # checkpoint. Handlers can only be set from the main thread.
+        if threading.current_thread() is not threading.main_thread():
+            return None
+        return signal.signal(signal.SIGTERM, self._terminate)
+
+    def _terminate(self, signum, frame):
+        logger.warning("Terminated")
+        raise SystemExit(128 + signum)
+
     def _process(self, file):
-        reader = csv.DictReader(file)
-        counter = 0
-        for row in reader:
-            namis = Namis(row)
-            result, error = namis.post()
-            counter += 1
-            if result:
-                self._write(data=row,filepath=self.posted_file)
-                logger.info(f"Row: {counter}, Reference: {result}, Status: Success")
-            else:
-                message = f"Row: {counter}, Error: {error}"
-                self._write(data=row, filepath=self.failed_file)
-                self._log(message)
-                logger.error(message)
-        self._send_email(file)
+        rows = self._screen((row, row) for row in read_rows(file))
+        if self.workers > 1:
+            self._process_pooled(rows)
+        else:
+            for counter, row, record in rows:
+                namis = Namis(record, api=self.api, farmer=self._farmer(record), seed=self._seed(counter, record))
+                result, error = self._post(namis.post)
+                self._record(counter, row, result, error)
+
+    def _process_pooled(self, rows):
+        # `workers` threads post rows through the shared session. Results are
+        # recorded in file order, at most twice as many rows as there are
+        # workers wait on the oldest to finish.
+        self.ordered = deque()
+        pool = ThreadPoolExecutor(self.workers, thread_name_prefix="namis")
+        try:
+            for counter, row, record in rows:
+                namis = Namis(record, api=self.api, farmer=self._farmer(record), seed=self._seed(counter, record))
+                self.ordered.append((pool.submit(self._post, namis.post), self._record_result, (counter, row)))
+                self._record_ordered(limit=2 * self.workers)
+            self._record_ordered(limit=0)
+        except BaseException:
+            # Interrupted: queued rows are dropped and paused ones give up, so
+            # nothing is posted once the checkpoint is saved
+            self.stopping.set()
+            pool.shutdown(cancel_futures=True)
+            raise
+        else:
+            pool.shutdown()
+        finally:
+            self.ordered = None
+
+    def _record_ordered(self, limit):
+        ordered = self.ordered
+        while ordered and (len(ordered) > limit or ordered[0][0] is None or ordered[0][0].done()):
+            future, write, args = ordered.popleft()
+            if future is not None:
+                try:
+                    args = (*args, *future.result())
+                except Exception as e:
+                    logger.exception(f"Row: {args[0]} raised an exception")
+                    args = (*args, None, str(e))
+            write(*args)
+
+    def _screen(self, rows):
+        # Takes (row as read, row to prepare) pairs and yields the rows to send,
+        # numbered in file order. Rows that are invalid, already registered or
+        # repeat a farmer from earlier in the file are recorded here instead.
+        numbered = enumerate(rows, start=self.offset + 1)
+        if self.rows:
+            numbered = itertools.islice(numbered, *self.rows)
+        if self.checkpoint and self.checkpoint.resumed:
+            numbered = ((counter, rows) for counter, rows in numbered if not self.checkpoint.recorded(counter))
+        while chunk := list(itertools.islice(numbered, settings.NAMIS_LOOKUP_BATCH_SIZE)):
+            prepared = []
+            for counter, (row, record) in chunk:
+                record, error = self._prepare(record)
+                if error:
+                    self._record(counter, row, None, error)
+                else:
+                    prepared.append((counter, row, record))
+            if self.digests:
+                prepared = self._changed(prepared)
+            if self.farmers:
+                self._lookup([self._national_id(record) for _, _, record in prepared])
+            for counter, row, record in prepared:
+                reason = self.farmers.check(self._national_id(record)) if self.farmers else None
+                if reason:
+                    self._skip(counter, row, reason)
+                elif self._unchanged(record):
+                    self._skip(counter, row, f"NationalID {self._national_id(record)} is unchanged", unchanged=True)
+                else:
+                    yield counter, row, record
+
+    def _changed(self, rows):
+        # Rows hashing the same as the last row posted for their farmer are skipped
+        hashed = [(counter, row, record, self._national_id(record), row_digest(record)) for counter, row, record in rows]
+        stored = self.digests.stored([national_id for _, _, _, national_id, _ in hashed])
+        changed = []
+        for counter, row, record, national_id, digest in hashed:
+            if national_id and stored.get(national_id) == digest:
+                self._skip(counter, row, f"NationalID {national_id} is unchanged", unchanged=True)
+                continue
+            if national_id:
+                self.hashes[counter] = (national_id, digest)
+            changed.append((counter, row, record))
+        return changed
+
+    def _national_id(self, record):
+        return (record.get("NationalID") or "").strip()
+
+    def _seed(self, counter, record):
+        # Rows without a NationalID get uids from their place in the file and
+        # their values, so a rerun after a hard kill updates the farmers it
+        # already sent rather than creating them again
+        values = record.values if isinstance(record, Row) else record.values()
+        return f"{self.source}:{counter}:" + "\x1f".join(map(str, values))
+
+    def _farmer(self, record):
+        # The farmer a row updates, None when it is created
+        return self.farmers.farmer(self._national_id(record)) if self.farmers else None
+
+    def _unchanged(self, record):
+        farmer = self._farmer(record)
+        return bool(farmer) and Namis(record, api=self.api, farmer=farmer).unchanged
+
+    def _lookup(self, national_ids):
+        # When the lookup fails rows are sent anyway, their uids are derived
+        # from the NationalID so DHIS2 still will not duplicate them
+        try:
+            self._post(lambda: self.farmers.lookup(national_ids))
+        except APIError as e:
+            logger.warning(f"Existing farmers could not be looked up: {e}")
+
+    def _post(self, post):
+        # While DHIS2 is unreachable the job waits and then resumes the same
+        # row, unless it is stopped meanwhile
+        while True:
+            try:
+                return post()
+            except CircuitOpenError as e:
+                logger.warning(f"Paused: {e}")
+                if self.stopping.wait(e.retry_after):
+                    raise StoppedError(str(e)) from e
+
+    def _record(self, counter, row, result, error):
+        self._report(self._record_result, counter, row, result, error)
+
+    def _skip(self, counter, row, reason, unchanged=False):
+        self._report(self._record_skip, counter, row, reason, unchanged)
+
+    def _report(self, write, *args):
+        # Pooled posting holds results back until the rows before them are recorded
+        if self.ordered is None:
+            write(*args)
+        else:
+            self.ordered.append((None, write, args))
+
+    def _record_result(self, counter, row, result, error):
+        hashed = self.hashes.pop(counter, None)
+        if self.results:
+            status = ImportRowResult.Status.FAILED if error or not result else ImportRowResult.Status.POSTED
+            self.results.add(counter, status, self._national_id(row), result, error)
+        if result and not error:
+            if hashed:
+                self.digests.add(*hashed)
+            self._write(data=row,filepath=self.posted_file)
+            logger.info(f"Row: {counter}, Reference: {result}, Status: Success")
+        else:
+            message = f"Row: {counter}, Error: {error}"
+            self._write(data=row, filepath=self.failed_file, Error=error or "")
+            self._log(message)
+            logger.error(message)
+        # Last, so a checkpoint saved here covers everything written for the row
+        if self.checkpoint:
+            self.checkpoint.mark(counter, result)
+
+    def _record_skip(self, counter, row, reason, unchanged):
+        hashed = self.hashes.pop(counter, None)
+        if self.results:
+            self.results.add(counter, ImportRowResult.Status.SKIPPED, self._national_id(row), error=reason)
+        if unchanged:
+            self.unchanged += 1
+            if hashed:
+                self.digests.add(*hashed)
+        self._write(data=row, filepath=self.skipped_file, Reason=reason)
+        logger.info(f"Row: {counter}, Skipped: {reason}")
+        if self.checkpoint:
+            self.checkpoint.mark(counter)
+
+    def _sink(self, filepath):
+        sink = self.sinks.get(filepath)
+        if sink is None:
+            sink = self.sinks[filepath] = ResultFile(filepath, settings.NAMIS_FLUSH_ROWS, settings.NAMIS_FLUSH_SECONDS)
+        return sink
+
+    def _close_sinks(self):
+        for sink in self.sinks.values():
+            sink.close()
+        self.sinks = {}
 
     def _log(self, message):
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         formatted_message = f"{current_time} - ERROR - {message}\n"
-        with open(self.log_file, 'a') as file:
-            file.write(formatted_message)
+        self._sink(self.log_file).write(formatted_message)
 
-    def _write(self, data, filepath, mode='a'):
-        file_exists = os.path.isfile(filepath)
-        with open(filepath, mode=mode, newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=data.keys())
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow(data)
+    def _write(self, data, filepath, **extra):
+        # Extra values, such as why a row failed, follow the row's own columns
+        self._sink(filepath).writerow([*data.header.columns, *extra], [*data.values, *extra.values()])
 
     def _send_email(self, file_path):
-        attachments = None
-        context = {
-            'file_name': file_path.split('/')[-1],
-            'status': 'completed successfully',
-        }
-        subject = 'Data Post Completed'
-        template_name = 'integration/emails/import_complete.html'
-        send_email(subject, template_name, context=context, attachments=attachments)
+        send_completed_email(file_path, unchanged=self.unchanged)
+
+
+class AsyncProcessor(Processor):
+    concurrency = settings.NAMIS_CONCURRENCY
+
+    def __init__(self, concurrency=None):
+        super().__init__()
+        if concurrency:
+            self.concurrency = concurrency
+
+    def _process(self, file):
+        # Screening and recording query the database and may block, which
+        # must not happen in the event loop: rows are screened in a thread of
+        # their own and results are recorded by another
+        self.reports = Queue()
+        self.failure = None
+        recorder = threading.Thread(target=self._recorder, name="recorder", daemon=True)
+        recorder.start()
+        try:
+            asyncio.run(self._process_async(file))
+        finally:
+            self.reports.put(None)
+            recorder.join()
+        if self.failure:
+            raise self.failure
+
+    async def _process_async(self, file):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+        loop = asyncio.get_running_loop()
+        rows = self._screen((row, row) for row in read_rows(file))
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="screener") as screener:
+            try:
+                async with AsyncAPI() as api:
+                    while (item := await loop.run_in_executor(screener, next, rows, None)) is not None:
+                        counter, row, record = item
+                        # Reading stops while `concurrency` farmers are in flight
+                        await semaphore.acquire()
+                        task = asyncio.create_task(self._post_async(api, semaphore, counter, row, record))
+                        pending.add(task)
+                        task.add_done_callback(pending.discard)
+                    await asyncio.gather(*pending)
+            finally:
+                # A row the screener pauses on gives up rather than hold the job
+                self.stopping.set()
+                screener.submit(connection.close)
+
+    def _recorder(self):
+        try:
+            while (item := self.reports.get()) is not None:
+                if self.failure:
+                    continue
+                write, args = item
+                try:
+                    write(*args)
+                except Exception as e:
+                    # Raised from _process once the rows in flight are done
+                    logger.exception(f"Recording row {args[0]} failed")
+                    self.failure = e
+        finally:
+            connection.close()
+
+    def _report(self, write, *args):
+        self.reports.put((write, args))
+
+    async def _post_async(self, api, semaphore, counter, row, record):
+        namis = AsyncNamis(record, api=api, farmer=self._farmer(record), seed=self._seed(counter, record))
+        try:
+            while True:
+                try:
+                    result, error = await namis.post()
+                    break
+                except CircuitOpenError as e:
+                    logger.warning(f"Row: {counter} paused: {e}")
+                    await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            logger.exception(f"Row: {counter} raised an exception")
+            result, error = None, str(e)
+        finally:
+            semaphore.release()
+        self._record(counter, row, result, error)
+
+
+class BulkProcessor(Processor):
+    batch_size = settings.NAMIS_BATCH_SIZE
+
+    def __init__(self, batch_size=None):
+        super().__init__()
+        if batch_size:
+            self.batch_size = batch_size
+
+    def _process(self, file):
+        rows = self._screen((row, row) for row in read_rows(file))
+        while batch := list(itertools.islice(rows, self.batch_size)):
+            records = [record for _, _, record in batch]
+            farmers = [self._farmer(record) for record in records]
+            seeds = [self._seed(counter, record) for counter, _, record in batch]
+            results = self._post(NamisBatch(records, api=self.api, farmers=farmers, seeds=seeds).post)
+            for (counter, row, _), (result, error) in zip(batch, results):
+                self._record(counter, row, result, error)
+
+
+class ColumnarProcessor(Processor):
+    block_size = settings.NAMIS_BLOCK_SIZE
+
+    # The columnar reader parses bytes, so files are opened in binary mode
+    binary = True
+
+    def upload(self, filepath):
+        logger.info("Process Initiated")
+        with default_storage.open(filepath, mode='rb') as file:
+            self._run(file)
+        logger.info("Process Completed")
+
+    def read(self, filepath):
+        logger.info("Process Initiated")
+        with open(filepath, mode='rb') as file:
+            self._run(file)
+        logger.info("Process Completed")
+
+    def _summarize(self, file):
+        text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+        try:
+            super()._summarize(text)
+        finally:
+            text.detach()
+        file.seek(0)
+
+    def _process(self, file):
+        blocks = read_blocks(file, self.block_size)
+        rows = itertools.chain.from_iterable(zip(originals, prepared) for originals, prepared in blocks)
+        for counter, row, record in self._screen(rows):
+            namis = Namis(record, api=self.api, farmer=self._farmer(record), seed=self._seed(counter, record))
+            result, error = self._post(namis.post)
+            self._record(counter, row, result, error)
+
+
+class PipelineProcessor(Processor):
+    # Reading, preparing, posting and recording run as stages on their own
+    # threads. Bounded queues between them keep memory flat for any file
+    # size, and their depths show which stage holds the others up: a full
+    # queue waits on the stage after it.
+    senders = settings.NAMIS_CONCURRENCY
+    queue_size = settings.NAMIS_QUEUE_SIZE
+    report_interval = 60
+    # How often a stage blocked on a queue checks whether the job is stopping
+    poll_interval = 0.1
+
+    done = object()
+
+    def __init__(self, senders=None, queue_size=None):
+        super().__init__()
+        if senders:
+            self.senders = senders
+        if queue_size:
+            self.queue_size = queue_size
+        self.queues = {}
+        self.failure = None
+
+    def depths(self):
+        return {name: queue.qsize() for name, queue in self.queues.items()}
+
+    def _process(self, file):
+        self.queues = {name: Queue(self.queue_size) for name in ("read", "send", "record")}
+        stages = [
+            threading.Thread(target=self._reader, args=(file,), name="reader"),
+            threading.Thread(target=self._transformer, name="transformer"),
+            *[threading.Thread(target=self._sender, name=f"sender-{number}") for number in range(self.senders)],
+        ]
+        recorder = threading.Thread(target=self._recorder, name="recorder")
+        for stage in [*stages, recorder]:
+            stage.start()
+        try:
+            while recorder.is_alive():
+                recorder.join(self.report_interval)
+                if recorder.is_alive():
+                    logger.info(f"Queue depths: {self.depths()}")
+        finally:
+            # An interrupted job stops every stage before the checkpoint is
+            # saved, so none posts or records rows a rerun will send again
+            self.stopping.set()
+            for stage in [*stages, recorder]:
+                stage.join()
+        if self.failure:
+            raise self.failure
+
+    def _fail(self, error):
+        # The first error of any stage is raised from _process once all have stopped
+        if self.failure is None:
+            self.failure = error
+
+    def _put(self, name, item):
+        # Gives up once the job is stopping, no stage may be left to take the item
+        while not self.stopping.is_set():
+            try:
+                self.queues[name].put(item, timeout=self.poll_interval)
+                return
+            except Full:
+                pass
+
+    def _get(self, name):
+        # The next item, or `done` once the job is stopping
+        while not self.stopping.is_set():
+            try:
+                return self.queues[name].get(timeout=self.poll_interval)
+            except Empty:
+                pass
+        return self.done
+
+    def _drain(self, name):
+        while (item := self._get(name)) is not self.done:
+            yield item
+
+    def _reader(self, file):
+        try:
+            for row in read_rows(file):
+                if self.stopping.is_set():
+                    break
+                self._put("read", row)
+        except Exception as e:
+            logger.exception("Reading the file failed, the rest of it is not sent")
+            self._fail(e)
+        finally:
+            self._put("read", self.done)
+
+    def _transformer(self):
+        rows = self._drain("read")
+        try:
+            for item in self._screen((row, row) for row in rows):
+                self._put("send", item)
+        except Exception as e:
+            logger.exception("Preparing rows failed, the rest of the file is not sent")
+            self._fail(e)
+            # The reader must not block on a queue nobody reads
+            for _ in rows:
+                pass
+        finally:
+            connection.close()
+            for _ in range(self.senders):
+                self._put("send", self.done)
+
+    def _sender(self):
+        try:
+            for counter, row, record in self._drain("send"):
+                try:
+                    namis = Namis(record, api=self.api, farmer=self._farmer(record), seed=self._seed(counter, record))
+                    result, error = self._post(namis.post)
+                except StoppedError:
+                    # Not recorded, so the rerun sends the row again
+                    return
+                except Exception as e:
+                    logger.exception(f"Row: {counter} raised an exception")
+                    result, error = None, str(e)
+                self._record(counter, row, result, error)
+        finally:
+            self._put("record", self.done)
+
+    def _recorder(self):
+        # The only stage writing result files, the others queue what to write
+        finished = 0
+        failed = False
+        try:
+            while finished < self.senders and not self.stopping.is_set():
+                item = self._get("record")
+                if item is self.done:
+                    finished += 1
+                    continue
+                write, args = item
+                if failed:
+                    continue
+                try:
+                    write(*args)
+                except Exception as e:
+                    logger.exception(f"Recording row {args[0]} failed")
+                    self._fail(e)
+                    failed = True
+        finally:
+            connection.close()
+
+    def _report(self, write, *args):
+        self._put("record", (write, args))
+
+
+PROCESSORS = {
+    "sync": Processor,
+    "async": AsyncProcessor,
+    "bulk": BulkProcessor,
+    "columnar": ColumnarProcessor,
+    "pipeline": PipelineProcessor,
+}
+
+
+def get_processor(mode=None):
+    return PROCESSORS[mode or settings.NAMIS_IMPORT_MODE]()
@@ -0,0 +1,144 @@
+import csv
+import io
+import logging
+import mmap
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from .models import ImportJob
+from .parts import merge_parts, use_part_files
+from .services import Processor, get_processor, send_completed_email
+
+logger = logging.getLogger(__name__)
+
+SCAN_SIZE = 1 << 20
+
+
+def _count(buffer, byte, start, stop):
+    count = 0
+    for position in range(start, stop, SCAN_SIZE):
+        count += buffer[position:min(position + SCAN_SIZE, stop)].count(byte)
+    return count
+
+
+def _count_rows(filepath, start, stop):
+    # Rows as read_rows numbers them: line breaks in quoted values and blank lines do not count
+    with open_range(filepath, 0, start, stop, binary=False) as file:
+        return sum(1 for values in csv.reader(file) if values)
+
+
+def shard_ranges(filepath, parts):
+    # Byte ranges of about equal size after the header line, each ending on a
+    # line break outside quotes, with the number of rows before each range
+    with open(filepath, 'rb') as file:
+        if not os.fstat(file.fileno()).st_size:
+            return 0, []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            size = len(buffer)
+            header_end = buffer.find(b"\n") + 1 or size
+            bounds = [header_end]
+            scanned, quotes = header_end, 0
+            for part in range(1, parts):
+                target = header_end + (size - header_end) * part // parts
+                if target <= bounds[-1]:
+                    continue
+                quotes += _count(buffer, b'"', scanned, target)
+                scanned = target
+                # A line break inside a quoted value does not end a row
+                while (newline := buffer.find(b"\n", scanned)) >= 0:
+                    quotes += _count(buffer, b'"', scanned, newline)
+                    scanned = newline + 1
+                    if quotes % 2 == 0:
+                        bounds.append(scanned)
+                        break
+            bounds.append(size)
+    ranges = []
+    rows = 0
+    for start, stop in zip(bounds, bounds[1:]):
+        if stop > start:
+            ranges.append((start, stop, rows))
+            rows += _count_rows(filepath, start, stop)
+    return header_end, ranges
+
+
+class ByteRange(io.RawIOBase):
+    # The header line of a file followed by the bytes from start to stop
+
+    def __init__(self, filepath, header_end, start, stop):
+        super().__init__()
+        self.name = filepath
+        self.file = open(filepath, 'rb')
+        self.spans = [[0, header_end], [start, stop]]
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.spans:
+            start, stop = self.spans[0]
+            if start >= stop:
+                self.spans.pop(0)
+                continue
+            self.file.seek(start)
+            read = self.file.readinto(memoryview(buffer)[:stop - start])
+            if not read:
+                self.spans.pop(0)
+                continue
+            self.spans[0][0] += read
+            return read
+        return 0
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def open_range(filepath, header_end, start, stop, binary):
+    file = io.BufferedReader(ByteRange(filepath, header_end, start, stop))
+    if binary:
+        return file
+    return io.TextIOWrapper(file, encoding="utf-8", newline="")
+
+
+def post_shard(filepath, directory, index, header_end, start, stop, offset, mode=None, job_id=None):
+    # Runs in a worker process: API.instance() gives it a session of its own
+    processor = get_processor(mode)
+    use_part_files(processor, directory, index)
+    processor.offset = offset
+    processor.job_id = job_id
+    processor.summarize = False
+    processor.notify = False
+    with open_range(filepath, header_end, start, stop, processor.binary) as file:
+        processor.process(file)
+    return processor.unchanged
+
+
+def post_sharded(filepath, processes, mode=None):
+    header_end, ranges = shard_ranges(filepath, processes)
+    directory = os.path.join(os.path.dirname(Processor.posted_file), "shards", uuid.uuid4().hex)
+    os.makedirs(directory, exist_ok=True)
+    job = ImportJob.objects.create(file=filepath[:255]) if settings.NAMIS_TRACK_RESULTS else None
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=len(ranges) or 1, mp_context=context) as pool:
+        futures = [
+            pool.submit(post_shard, filepath, directory, index, header_end, start, stop, offset, mode, job and job.pk)
+            for index, (start, stop, offset) in enumerate(ranges)
+        ]
+        try:
+            unchanged = sum(future.result() for future in futures)
+        except BaseException:
+            if job:
+                job.finish(ImportJob.Status.FAILED)
+            raise
+    if job:
+        job.finish(ImportJob.Status.COMPLETED)
+    merge_parts(directory, range(len(ranges)))
+    logger.info(f"{filepath} posted by {len(ranges)} processes")
+    send_completed_email(filepath, unchanged=unchanged)
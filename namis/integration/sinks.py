@@ -0,0 +1,81 @@
+import csv
+import os
+import threading
+
+
+class Lines(list):
+    # Formatted lines, csv.writer writes into it as into a file
+    write = list.append
+
+
+class ResultFile:
+    # A result file kept open for a whole job. Lines are collected and
+    # flushed every `rows` lines, `seconds` after the first unflushed one even
+    # while nothing else is written (a job paused on an open circuit), and
+    # when the file is closed. Each flush is a single write of whole lines,
+    # so jobs appending to the same file cannot split each other's records.
+    # CSV files get a header line when they are first created.
+
+    def __init__(self, path, rows, seconds):
+        self.path = path
+        self.rows = rows
+        self.seconds = seconds
+        self.file = None
+        self.lines = Lines()
+        self.writer = csv.writer(self.lines)
+        self.unflushed = 0
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def _open(self):
+        new = not os.path.isfile(self.path)
+        self.file = open(self.path, mode='ab', buffering=0)
+        return new
+
+    def writerow(self, columns, values):
+        with self.lock:
+            if self.file is None and self._open():
+                self.writer.writerow(columns)
+            self.writer.writerow(values)
+            self._written()
+
+    def write(self, line):
+        with self.lock:
+            if self.file is None:
+                self._open()
+            self.lines.append(line)
+            self._written()
+
+    def _written(self):
+        self.unflushed += 1
+        if self.unflushed >= self.rows:
+            self._flush()
+        elif self.timer is None:
+            self.timer = threading.Timer(self.seconds, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.unflushed = 0
+        if self.file is None or not self.lines:
+            return
+        data = "".join(self.lines).encode()
+        self.lines.clear()
+        # An unbuffered file may write less than asked, the rest follows
+        view = memoryview(data)
+        while view:
+            view = view[self.file.write(view):]
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.file is not None:
+                self.file.close()
+            self.file = None
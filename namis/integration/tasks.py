@@ -1,11 +1,102 @@
+import logging
+import os
+import uuid
+
+from celery import chord
 from celery import shared_task
-from .services import Processor
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .models import ImportJob
+from .parts import merge_parts, use_part_files
+from .rows import read_rows
+from .services import Processor, get_processor, send_completed_email
+
+logger = logging.getLogger(__name__)
+
+
+def count_rows(filepath):
+    with default_storage.open(filepath, mode='r') as file:
+        return sum(1 for _ in read_rows(file))
+
+
+def chunk_dir(job):
+    return os.path.join(os.path.dirname(Processor.posted_file), "chunks", job)
 
-@shared_task(soft_time_limit=72000, time_limit=324000)  # 30days, 90days
-def  post_file(filepath):
+
+# Late acks put a task back on the queue when its worker dies, and a task out
+# of time is resubmitted; either way the rerun resumes from the checkpoint.
+# The broker's visibility timeout is set above the time limits, so a running
+# task is never handed to a second worker
+@shared_task(
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    soft_time_limit=settings.NAMIS_FILE_SOFT_TIME_LIMIT,
+    time_limit=settings.NAMIS_FILE_TIME_LIMIT,
+)
+def  post_file(self, filepath, mode=None):
     try:
-        processor = Processor()
+        # Large files are split into chunks of NAMIS_CHUNK_ROWS rows posted by
+        # separate tasks, so they spread over every worker
+        total = count_rows(filepath)
+        if total > settings.NAMIS_CHUNK_ROWS:
+            job = uuid.uuid4().hex
+            os.makedirs(chunk_dir(job), exist_ok=True)
+            job_id = None
+            if settings.NAMIS_TRACK_RESULTS:
+                job_id = ImportJob.objects.create(file=filepath[:255]).pk
+            chunks = [
+                post_chunk.s(filepath, job, index, start, min(start + settings.NAMIS_CHUNK_ROWS, total), mode, job_id)
+                for index, start in enumerate(range(0, total, settings.NAMIS_CHUNK_ROWS))
+            ]
+            chord(chunks)(merge_chunks.s(filepath, job, job_id))
+            return
+        processor = get_processor(mode)
         processor.upload(filepath)
-    except:
-        pass
-    
\ No newline at end of file
+    except SoftTimeLimitExceeded:
+        logger.warning(f"{filepath} ran out of time, resubmitting")
+        raise self.retry(countdown=0, max_retries=settings.NAMIS_RESUME_RETRIES)
+    except Exception:
+        logger.exception(f"{filepath} failed")
+        raise
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    soft_time_limit=settings.NAMIS_CHUNK_TIME_LIMIT,
+    time_limit=settings.NAMIS_CHUNK_TIME_LIMIT + 600,
+)
+def post_chunk(self, filepath, job, index, start, stop, mode=None, job_id=None):
+    # A failed chunk still reports back, so the others are merged and mailed
+    error = None
+    processor = get_processor(mode)
+    use_part_files(processor, chunk_dir(job), index)
+    processor.rows = (start, stop)
+    processor.job_id = job_id
+    processor.summarize = index == 0
+    processor.notify = False
+    try:
+        processor.upload(filepath)
+    except SoftTimeLimitExceeded:
+        if self.request.retries < settings.NAMIS_RESUME_RETRIES:
+            raise self.retry(countdown=0, max_retries=settings.NAMIS_RESUME_RETRIES)
+        logger.error(f"Rows {start + 1} to {stop} of {filepath} ran out of time")
+        error = "Out of time"
+    except Exception as e:
+        logger.exception(f"Rows {start + 1} to {stop} of {filepath} failed")
+        error = str(e)
+    return {"index": index, "unchanged": processor.unchanged, "error": error}
+
+
+@shared_task
+def merge_chunks(results, filepath, job, job_id=None):
+    merge_parts(chunk_dir(job), [result["index"] for result in results])
+    failed = any(result["error"] for result in results)
+    status = "completed with errors" if failed else "completed successfully"
+    if job_id:
+        ImportJob.objects.get(pk=job_id).finish(ImportJob.Status.FAILED if failed else ImportJob.Status.COMPLETED)
+    send_completed_email(filepath, status=status, unchanged=sum(result["unchanged"] for result in results))
@@ -0,0 +1,32 @@
+import pytest
+from django.core.cache import cache
+
+from namis.integration.services import Processor
+
+from .factories import FakeAPI
+
+
+@pytest.fixture()
+def api():
+    return FakeAPI()
+
+
+@pytest.fixture(autouse=True)
+def _result_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(Processor, "posted_file", str(tmp_path / "posted.csv"))
+    monkeypatch.setattr(Processor, "failed_file", str(tmp_path / "failed.csv"))
+    monkeypatch.setattr(Processor, "skipped_file", str(tmp_path / "skipped.csv"))
+    monkeypatch.setattr(Processor, "log_file", str(tmp_path / "errors.log"))
+    monkeypatch.setattr(Processor, "_send_email", lambda self, file: None)
+
+
+@pytest.fixture(autouse=True)
+def _offline(settings):
+    # Processors would otherwise fetch metadata and look up farmers in DHIS2,
+    # and keep hashes and checkpoints in the database
+    settings.NAMIS_VALIDATE = False
+    settings.NAMIS_SKIP_EXISTING = False
+    settings.NAMIS_DELTA = False
+    settings.NAMIS_CHECKPOINT = False
+    settings.NAMIS_TRACK_RESULTS = False
+    cache.clear()
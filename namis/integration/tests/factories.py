@@ -0,0 +1,232 @@
+import csv
+
+import orjson
+
+from namis.integration.responses import ImportResult
+
+COLUMNS = [
+    "Blocks",
+    "NationalIDQRCode",
+    "NationalID",
+    "HouseholdHead",
+    "Birthday",
+    "Sex",
+    "PhoneNumber",
+    "PhoneType",
+    "Education",
+    "Occupation",
+    "HeadCondition",
+    "ADD",
+    "District",
+    "Constituency",
+    "TA",
+    "GVH",
+    "NearestAdmarc",
+    "NearestMarket",
+    "HouseholdSize",
+    "UnderFiveChildren",
+    "FarmingParticipants",
+    "Disabilities",
+    "FarmingIncome",
+    "OverallIncome",
+    "MaritalStatus",
+    "PrimaryIncomeSource",
+    "SpouseName",
+    "FarmerGroup",
+    "FarmerGroupName",
+    "TotalLandSize",
+    "CreditService",
+    "CreditServiceProvider",
+    "Extension_FaceToFace",
+    "Extension_SocialMedia",
+    "Extension_Radios",
+    "Extension_Posters",
+    "Extension_FellowFarmers",
+    "Extension_AgroSuppliers",
+    "PreferredMode_FaceToFace",
+    "PreferredMode_SocialMedia",
+    "PreferredMode_Radios",
+    "PreferredMode_Posters",
+    "PreferredMode_FellowFarmers",
+    "PreferredMode_AgroSuppliers",
+    "ReceiptOfSupport",
+    "SourceOfSupport",
+    "SupportOrganization",
+    "SupportDuration",
+    "Support_Cash",
+    "Support_Seeds",
+    "Support_Fertilizer",
+    "Support_ExtensionService",
+    "Support_Livestock",
+    "Support_LandManagement",
+    "Support_Nutrition",
+    "ReceiptOfExtraSupport",
+    "ExtraSupportOrganization",
+    "ExtraSupportDuration",
+    "ExtraSupport_Cash",
+    "ExtraSupport_Seeds",
+    "ExtraSupport_Fertilizer",
+    "ExtraSupport_ExtensionService",
+    "ExtraSupport_Livestock",
+    "ExtraSupport_LandManagement",
+    "ExtraSupport_Nutrition",
+    "UseIrrigation",
+    "IrrigationType",
+    "IrrigationMethod",
+    "EnergySource",
+    "WaterSource",
+    "SurfaceWaterSource",
+    "SubsurfaceWaterSource",
+    "EnterpriseType",
+    "Maize",
+    "Millet",
+    "Okra",
+    "Onions",
+    "Papaya",
+    "PigeonPeas",
+    "Pineapple",
+    "Pumpkin",
+    "Rice",
+    "Sesame",
+    "Sorghum",
+    "Soyabean",
+    "Sugarcane",
+    "Sunflower",
+    "SweetPotato",
+    "Tomatoes",
+    "Wheat",
+    "MainFoodCropOutput",
+    "Pestcontrol_Fungicides",
+    "Pestcontrol_Rodenticides",
+    "Pestcontrol_Insecticides",
+    "Pestcontrol_Molluscicides",
+    "Pestcontrol_Herbicides",
+    "Pestcontrol_BiologicalMethods",
+    "Pestcontrol_TraditionalMethods",
+    "Fertilizer_NPK",
+    "Fertilizer_Urea",
+    "Fertilizer_DAP",
+    "Fertilizer_OrganicManure",
+    "Fertilizer_Hybrid",
+    "Fertilizer_SulphateOfAmmonium",
+    "Fertilizer_CAN",
+    "Fertilizer_SuperD",
+    "Fertilizer_DCompound",
+    "SeedMultiplication",
+    "KeepLivestock",
+    "MainPastureLand",
+    "Cattle",
+    "Goat",
+    "Bees",
+    "Chicken",
+    "Ducks",
+    "GuineaFowls",
+    "GuineaPigs",
+    "Pigeon",
+    "Pigs",
+    "Quills",
+    "Rabbits",
+    "Sheep",
+    "Turkey",
+    "FishFarmingPractice",
+    "FishFarmingPurpose",
+    "LabourSource",
+]
+
+
+def make_record(**values):
+    record = dict.fromkeys(COLUMNS, "Yes")
+    record["Blocks"] = "OU000000001"
+    record["NationalID"] = "NID0000001"
+    record["Birthday"] = "1980-01-01"
+    record.update(values)
+    return record
+
+
+def write_csv(path, records):
+    with open(path, mode="w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(records)
+    return path
+
+
+def import_body(reference=None, conflict=None):
+    summary = {"status": "SUCCESS" if reference else "ERROR", "reference": reference}
+    if conflict:
+        summary["conflicts"] = [{"object": "attribute", "value": conflict}]
+    return {"response": {"importSummaries": [summary]}}
+
+
+def import_summary(reference=None, conflict=None):
+    return ImportResult.from_dict(import_body(reference, conflict))
+
+
+class FakeAPI:
+    def __init__(self, reference="TEI00000001", metadata=None):
+        self.reference = reference
+        self.metadata = metadata or {}
+        self.calls = []
+
+    def get(self, endpoint, params=None):
+        self.calls.append((endpoint, params))
+        return self.metadata
+
+    def post(self, endpoint, payload):
+        self.calls.append((endpoint, orjson.loads(payload) if isinstance(payload, bytes) else payload))
+        return import_summary(self.reference)
+
+
+def program_metadata(attributes=(), elements=()):
+    # attributes and elements are (uid, value type, mandatory, option codes) tuples
+    def element(uid, value_type, options):
+        element = {"id": uid, "name": uid, "valueType": value_type}
+        if options:
+            element["optionSet"] = {"id": "OPTIONSET01", "options": [{"code": code, "name": code} for code in options]}
+        return element
+
+    return {
+        "id": "PROGRAM0001",
+        "programTrackedEntityAttributes": [
+            {"mandatory": mandatory, "trackedEntityAttribute": element(uid, value_type, options)}
+            for uid, value_type, mandatory, options in attributes
+        ],
+        "programStages": [
+            {
+                "id": stage,
+                "programStageDataElements": [
+                    {"compulsory": mandatory, "dataElement": element(uid, value_type, options)}
+                    for uid, value_type, mandatory, options in stage_elements
+                ],
+            }
+            for stage, stage_elements in elements
+        ],
+    }
+
+
+def org_units_page(*units, page=1, page_count=1):
+    # units are (uid, code, name, ancestor names) tuples
+    return {
+        "pager": {"page": page, "pageCount": page_count},
+        "organisationUnits": [
+            {"id": uid, "code": code, "name": name, "ancestors": [{"name": ancestor} for ancestor in ancestors]}
+            for uid, code, name, ancestors in units
+        ],
+    }
+
+
+def fake_get(metadata, org_units=None):
+    # API.get answering program and org unit requests
+    org_units = org_units or org_units_page(("OU000000001", None, "Block 1", []))
+
+    def get(self, endpoint, params=None):
+        return org_units if endpoint == "organisationUnits" else metadata
+
+    return get
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        body = body if body is not None else import_body("TEI00000001")
+        self.content = orjson.dumps(body)
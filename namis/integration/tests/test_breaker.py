@@ -0,0 +1,37 @@
+from namis.integration.breaker import CircuitBreaker
+
+
+def test_opens_after_threshold():
+    breaker = CircuitBreaker("events", threshold=2, reset_timeout=60)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_success_resets_failures():
+    breaker = CircuitBreaker("events", threshold=2, reset_timeout=60)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert not breaker.is_open
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker("events", threshold=1, reset_timeout=0)
+    breaker.failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.success()
+    assert breaker.allow()
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("events", threshold=5, reset_timeout=0)
+    for _ in range(5):
+        breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.is_open
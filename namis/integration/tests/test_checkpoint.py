@@ -0,0 +1,143 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from namis.integration.checkpoint import Checkpoint
+from namis.integration.models import ImportCheckpoint
+from namis.integration.models import ImportJob
+from namis.integration.models import ImportRowResult
+from namis.integration.models import RowDigest
+from namis.integration.services import Namis
+from namis.integration.services import Processor
+
+from .factories import make_record
+from .factories import write_csv
+
+pytestmark = pytest.mark.django_db
+
+
+def test_rows_recorded_out_of_order():
+    checkpoint = Checkpoint("upload.csv", 0, interval=100)
+    checkpoint.mark(2, "TEI0000002")
+    checkpoint.mark(1)
+    checkpoint.mark(4, "TEI0000004")
+    assert (checkpoint.row, checkpoint.done) == (2, {4: "TEI0000004"})
+    checkpoint.save()
+
+    loaded = Checkpoint.load("upload.csv", 0, interval=100)
+    assert loaded.resumed
+    assert [row for row in range(1, 6) if not loaded.recorded(row)] == [3, 5]
+
+
+def test_saved_every_interval():
+    checkpoint = Checkpoint("upload.csv", 0, interval=2)
+    checkpoint.mark(1)
+    assert not ImportCheckpoint.objects.exists()
+    checkpoint.mark(2)
+    assert ImportCheckpoint.objects.get().row == 2
+
+
+def test_interrupted_job_resumes(monkeypatch, settings, tmp_path):
+    settings.NAMIS_CHECKPOINT = True
+    records = [make_record(NationalID=f"NID{number:07}") for number in range(5)]
+    filepath = write_csv(tmp_path / "upload.csv", records)
+    posted = []
+
+    def stopped(self):
+        if self.record["NationalID"] == "NID0000003":
+            raise SystemExit(143)
+        posted.append(self.record["NationalID"])
+        return "TEI0000001", None
+
+    monkeypatch.setattr(Namis, "post", stopped)
+    with pytest.raises(SystemExit):
+        Processor().read(filepath)
+    assert ImportCheckpoint.objects.get().row == 3
+
+    monkeypatch.setattr(Namis, "post", lambda self: posted.append(self.record["NationalID"]) or ("TEI0000001", None))
+    Processor().read(filepath)
+
+    assert posted == [record["NationalID"] for record in records]
+    with open(Processor.posted_file) as file:
+        assert len(list(csv.DictReader(file))) == 5
+    assert not ImportCheckpoint.objects.exists()
+
+
+def test_recorded_rows_are_written_before_the_checkpoint(monkeypatch, settings, tmp_path):
+    # What a hard kill would leave: every row the checkpoint covers is stored
+    settings.NAMIS_CHECKPOINT = True
+    settings.NAMIS_CHECKPOINT_ROWS = 1
+    settings.NAMIS_TRACK_RESULTS = True
+    settings.NAMIS_DELTA = True
+    stored = []
+
+    def post(self):
+        checkpoint = ImportCheckpoint.objects.first()
+        stored.append((
+            checkpoint.row if checkpoint else 0,
+            ImportRowResult.objects.count(),
+            RowDigest.objects.count(),
+        ))
+        return "TEI0000001", None
+
+    monkeypatch.setattr(Namis, "post", post)
+    records = [make_record(NationalID=f"NID{number:07}") for number in range(3)]
+    Processor().read(write_csv(tmp_path / "upload.csv", records))
+
+    assert stored == [(0, 0, 0), (1, 1, 1), (2, 2, 2)]
+
+
+def test_resumed_job_records_to_the_same_job(monkeypatch, settings, tmp_path):
+    settings.NAMIS_CHECKPOINT = True
+    settings.NAMIS_TRACK_RESULTS = True
+    records = [make_record(NationalID=f"NID{number:07}") for number in range(5)]
+    filepath = write_csv(tmp_path / "upload.csv", records)
+
+    def stopped(self):
+        if self.record["NationalID"] == "NID0000003":
+            raise SystemExit(143)
+        return "TEI0000001", None
+
+    monkeypatch.setattr(Namis, "post", stopped)
+    with pytest.raises(SystemExit):
+        Processor().read(filepath)
+    monkeypatch.setattr(Namis, "post", lambda self: ("TEI0000001", None))
+    Processor().read(filepath)
+
+    job = ImportJob.objects.get()
+    assert (job.status, job.posted) == (ImportJob.Status.COMPLETED, 5)
+
+
+def test_result_files_are_flushed_before_the_checkpoint(monkeypatch, settings, tmp_path):
+    settings.NAMIS_CHECKPOINT = True
+    settings.NAMIS_CHECKPOINT_ROWS = 2
+    settings.NAMIS_FLUSH_ROWS = 100
+    settings.NAMIS_FLUSH_SECONDS = 3600
+    written = []
+
+    def post(self):
+        posted = Path(Processor.posted_file)
+        written.append(len(posted.read_text().splitlines()) if posted.exists() else 0)
+        return "TEI0000001", None
+
+    monkeypatch.setattr(Namis, "post", post)
+    records = [make_record(NationalID=f"NID{number:07}") for number in range(3)]
+    Processor().read(write_csv(tmp_path / "upload.csv", records))
+
+    # The header and two rows are on disk once the checkpoint is saved at row 2
+    assert written == [0, 0, 3]
+
+
+def test_rows_without_a_national_id_are_resent_to_the_same_farmers(monkeypatch, tmp_path):
+    # What a rerun after a hard kill sends again must not create new farmers
+    records = [make_record(NationalID=""), make_record(NationalID="", HouseholdHead="Someone else")]
+    filepath = write_csv(tmp_path / "upload.csv", records)
+    sent = []
+    monkeypatch.setattr(Namis, "post", lambda self: sent.append(self.uids["trackedEntityInstance"]) or ("TEI0000001", None))
+
+    Processor().read(filepath)
+    Processor().read(filepath)
+
+    assert len(set(sent[:2])) == 2
+    assert sent[2:] == sent[:2]
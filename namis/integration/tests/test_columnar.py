@@ -0,0 +1,48 @@
+import csv
+
+from namis.integration.columnar import read_blocks
+from namis.integration.mapping import MAPPINGS
+
+from .factories import make_record
+from .factories import write_csv
+
+
+def test_blocks_match_row_conversion(tmp_path):
+    records = [
+        make_record(Maize=" YES", Rice="no", HouseholdSize="1.50"),
+        make_record(Maize="", Rice="maybe", SpouseName='Jane "J" Doe, Jr'),
+    ]
+    filepath = write_csv(tmp_path / "upload.csv", records)
+    with open(filepath, mode="rb") as file:
+        blocks = list(read_blocks(file, block_size=1 << 10))
+
+    originals = [row for rows, _ in blocks for row in rows]
+    prepared = [row for _, rows in blocks for row in rows]
+    with open(filepath, newline="") as file:
+        assert [row.to_dict() for row in originals] == list(csv.DictReader(file))
+    for original, record in zip(originals, prepared):
+        for mapping in MAPPINGS:
+            assert mapping.build(record) == mapping.build(original)
+            assert mapping.encode(record) == mapping.encode(original)
+
+
+def test_ragged_rows_are_padded_in_place(tmp_path):
+    filepath = tmp_path / "upload.csv"
+    filepath.write_bytes(b'Maize,Rice,SpouseName\nYes,no,Jane\nyes\n"x\ny",Yes,John,Extra\nno,no,Ann\n')
+    with open(filepath, mode="rb") as file:
+        blocks = list(read_blocks(file, block_size=16))
+
+    originals = [row.values for rows, _ in blocks for row in rows]
+    prepared = [row.values for _, rows in blocks for row in rows]
+    assert [list(values) for values in originals] == [
+        ["Yes", "no", "Jane"],
+        ["yes", "", ""],
+        ["x\ny", "Yes", "John"],
+        ["no", "no", "Ann"],
+    ]
+    assert [list(values) for values in prepared] == [
+        [True, False, "Jane"],
+        [True, False, ""],
+        [False, True, "John"],
+        [False, False, "Ann"],
+    ]
@@ -0,0 +1,63 @@
+import csv
+
+import pytest
+
+from namis.integration.columnar import read_blocks
+from namis.integration.digests import DigestStore
+from namis.integration.digests import row_digest
+from namis.integration.models import RowDigest
+from namis.integration.rows import read_rows
+from namis.integration.services import Namis
+from namis.integration.services import Processor
+
+from .factories import make_record
+from .factories import write_csv
+
+pytestmark = pytest.mark.django_db
+
+
+def test_digest_ignores_column_order():
+    record = make_record()
+    reordered = dict(reversed(record.items()))
+    assert row_digest(record) == row_digest(reordered)
+    assert row_digest(record) != row_digest(make_record(HouseholdSize="7"))
+
+
+def test_digest_is_the_same_in_every_mode(tmp_path):
+    filepath = write_csv(tmp_path / "upload.csv", [make_record(), make_record(Maize="no")])
+    with open(filepath, newline="") as file:
+        rows = [row_digest(row) for row in read_rows(file)]
+    with open(filepath, "rb") as file:
+        blocks = [row_digest(row) for _, prepared in read_blocks(file, 1 << 20) for row in prepared]
+    assert rows == blocks
+
+
+def test_store_upserts():
+    store = DigestStore(batch_size=2)
+    store.add("NID0000001", "a")
+    assert RowDigest.objects.count() == 0
+    store.add("NID0000002", "b")
+    store.add("NID0000001", "c")
+    store.flush()
+    assert store.stored(["NID0000001", "NID0000002", ""]) == {"NID0000001": "c", "NID0000002": "b"}
+
+
+def test_unchanged_rows_are_skipped(monkeypatch, settings, tmp_path):
+    settings.NAMIS_DELTA = True
+    posted = []
+    monkeypatch.setattr(Namis, "post", lambda self: posted.append(self.record["NationalID"]) or ("TEI0000001", None))
+    records = [make_record(NationalID=f"NID000000{number}") for number in range(3)]
+    Processor().read(write_csv(tmp_path / "first.csv", records))
+
+    records[1] = make_record(NationalID="NID0000001", HouseholdSize="7")
+    posted.clear()
+    processor = Processor()
+    processor.read(write_csv(tmp_path / "second.csv", records))
+
+    assert posted == ["NID0000001"]
+    assert processor.unchanged == 2
+    with open(processor.skipped_file) as file:
+        assert [row["Reason"] for row in csv.DictReader(file)][-2:] == [
+            "NationalID NID0000000 is unchanged",
+            "NationalID NID0000002 is unchanged",
+        ]
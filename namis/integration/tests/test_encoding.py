@@ -0,0 +1,14 @@
+import orjson
+
+from namis.integration.encoding import Template
+
+
+def test_render_splices_values():
+    template = Template(["orgUnit", "dataValues"], constants={"status": "COMPLETED"})
+    body = template.render('OU "1"', b"[1,2]")
+    assert orjson.loads(body) == {"status": "COMPLETED", "orgUnit": 'OU "1"', "dataValues": [1, 2]}
+
+
+def test_render_without_constants():
+    body = Template(["a", "b"]).render(None, True)
+    assert orjson.loads(body) == {"a": None, "b": True}
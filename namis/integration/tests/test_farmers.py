@@ -0,0 +1,169 @@
+import csv
+
+from namis.integration.farmers import Farmer
+from namis.integration.farmers import FarmerRegistry
+from namis.integration.farmers import as_text
+from namis.integration.mapping import PROFILE
+from namis.integration.services import API
+from namis.integration.services import Namis
+from namis.integration.services import Processor
+
+from .factories import FakeAPI
+from .factories import import_summary
+from .factories import make_record
+from .factories import write_csv
+
+
+def registered(*national_ids):
+    return {
+        "trackedEntityInstances": [
+            {
+                "trackedEntityInstance": f"TEI{national_id[3:]}",
+                "attributes": [{"attribute": Namis.national_id_attribute, "value": national_id}],
+            }
+            for national_id in national_ids
+        ],
+    }
+
+
+def current(mapping, record):
+    return {field.uid: as_text(value) for field, value in zip(mapping.fields, mapping.values(record))}
+
+
+def existing(record):
+    # The farmer as DHIS2 would have it after importing the record
+    events = {
+        stage: (f"EVENT{number:06}", current(mapping, record))
+        for number, (stage, mapping) in enumerate(Namis.stages)
+    }
+    return Farmer("TEI0000001", current(PROFILE, record), "ENROLLMENT1", events)
+
+
+def test_lookups_are_batched():
+    api = FakeAPI(metadata=registered("NID0000002"))
+    farmers = FarmerRegistry(api, Namis.program, Namis.national_id_attribute, batch_size=2)
+    farmers.lookup(["NID0000001", "NID0000002", "NID0000002", "", "NID0000003"])
+    farmers.lookup(["NID0000001"])
+
+    filters = [params["filter"] for _, params in api.calls]
+    assert filters == [
+        f"{Namis.national_id_attribute}:IN:NID0000001;NID0000002",
+        f"{Namis.national_id_attribute}:IN:NID0000003",
+    ]
+    assert farmers.known == {"NID0000002": "TEI0000002"}
+
+
+def test_known_and_repeated_farmers_are_skipped(monkeypatch, settings, tmp_path):
+    settings.NAMIS_SKIP_EXISTING = True
+    lookups = []
+
+    def get(self, endpoint, params=None):
+        lookups.append(params["filter"])
+        return registered("NID0000002")
+
+    monkeypatch.setattr(API, "get", get)
+    posted = []
+    monkeypatch.setattr(Namis, "post", lambda self: posted.append(self.record["NationalID"]) or ("TEI00000001", None))
+    national_ids = ["NID0000001", "NID0000002", "NID0000001", "NID0000003"]
+    filepath = write_csv(tmp_path / "upload.csv", [make_record(NationalID=national_id) for national_id in national_ids])
+
+    processor = Processor()
+    processor.read(filepath)
+
+    assert len(lookups) == 1
+    assert posted == ["NID0000001", "NID0000003"]
+    with open(processor.skipped_file) as file:
+        assert [row["Reason"] for row in csv.DictReader(file)] == [
+            "NationalID NID0000002 is already registered as TEI0000002",
+            "NationalID NID0000001 appears earlier in the file",
+        ]
+
+
+def test_references_are_cached_across_jobs():
+    api = FakeAPI(metadata=registered("NID0000002"))
+    FarmerRegistry(api, Namis.program, Namis.national_id_attribute, batch_size=200).lookup(["NID0000002"])
+    farmers = FarmerRegistry(api, Namis.program, Namis.national_id_attribute, batch_size=200)
+    farmers.lookup(["NID0000002"])
+    assert len(api.calls) == 1
+    assert farmers.check("NID0000002") == "NationalID NID0000002 is already registered as TEI0000002"
+
+
+def test_unchanged_farmer_is_not_sent(api):
+    record = make_record()
+    namis = Namis(record, api=api, farmer=existing(record))
+    assert namis.unchanged
+    assert namis.post() == ("TEI0000001", None)
+    assert api.calls == []
+
+
+def test_changed_attributes_update_the_profile(api):
+    farmer = existing(make_record())
+    namis = Namis(make_record(HouseholdHead="Someone else"), api=api, farmer=farmer)
+    namis.post()
+
+    [(endpoint, profile)] = api.calls
+    assert endpoint == Namis.profile_endpoint
+    assert profile["trackedEntityInstance"] == "TEI0000001"
+
+
+def test_changed_events_are_updated_in_place(api):
+    farmer = existing(make_record())
+    namis = Namis(make_record(HouseholdSize="7"), api=api, farmer=farmer)
+    namis.post()
+
+    [(endpoint, events)] = api.calls
+    assert endpoint == Namis.events_endpoint
+    assert {event["event"] for event in events["events"]} == {event for event, _ in farmer.events.values()}
+    assert {event["enrollment"] for event in events["events"]} == {"ENROLLMENT1"}
+
+
+def test_fields_without_a_column_keep_their_values(api):
+    farmer = existing(make_record())
+    serial_number = PROFILE.fields[0].uid
+    spouse_birthday = Namis.stages[0][1].fields[-1].uid
+    farmer.attributes[serial_number] = "SN-42"
+    farmer.events[Namis.stages[0][0]][1][spouse_birthday] = "1980-01-01"
+    namis = Namis(make_record(HouseholdHead="Someone else", HouseholdSize="7"), api=api, farmer=farmer)
+    namis.post()
+
+    [(_, profile), (_, events)] = api.calls
+    attributes = {attribute["attribute"]: attribute["value"] for attribute in profile["attributes"]}
+    assert attributes[serial_number] == "SN-42"
+    data_values = {value["dataElement"]: value["value"] for value in events["events"][0]["dataValues"]}
+    assert data_values[spouse_birthday] == "1980-01-01"
+
+
+def test_upsert_skips_unchanged_rows(monkeypatch, settings, tmp_path):
+    settings.NAMIS_SKIP_EXISTING = True
+    settings.NAMIS_UPSERT = True
+    unchanged, changed = make_record(), make_record(NationalID="NID0000002", HouseholdSize="7")
+    instances = []
+    for record in (unchanged, make_record(NationalID="NID0000002")):
+        farmer = existing(record)
+        instances.append({
+            "trackedEntityInstance": farmer.reference,
+            "attributes": [{"attribute": uid, "value": value} for uid, value in farmer.attributes.items()],
+            "enrollments": [{
+                "enrollment": farmer.enrollment,
+                "program": Namis.program,
+                "events": [
+                    {
+                        "event": event,
+                        "programStage": stage,
+                        "dataValues": [{"dataElement": uid, "value": value} for uid, value in values.items()],
+                    }
+                    for stage, (event, values) in farmer.events.items()
+                ],
+            }],
+        })
+    monkeypatch.setattr(API, "get", lambda self, endpoint, params=None: {"trackedEntityInstances": instances})
+    posted = []
+    monkeypatch.setattr(API, "post", lambda self, endpoint, payload: posted.append(endpoint) or import_summary("TEI0000001"))
+    filepath = write_csv(tmp_path / "upload.csv", [unchanged, changed])
+
+    processor = Processor()
+    processor.read(filepath)
+
+    assert posted == [Namis.events_endpoint]
+    with open(processor.skipped_file) as file:
+        assert [row["Reason"] for row in csv.DictReader(file)] == ["NationalID NID0000001 is unchanged"]
@@ -0,0 +1,31 @@
+from namis.integration.mapping import FARMING_METHOD
+from namis.integration.mapping import PROFILE
+from namis.integration.mapping import Field
+from namis.integration.mapping import Mapping
+from namis.integration.util import to_bool
+
+from .factories import COLUMNS
+from .factories import make_record
+
+
+def test_build_converts_values():
+    mapping = Mapping(
+        "dataElement",
+        [
+            Field("Maize", "GUvE51AL6sI", "Maize", to_bool),
+            Field("HouseholdSize", "V9ohTgE9gt6", "HouseholdSize", str),
+            Field("ProductionPurpose", "uzEJJETmBoM"),
+        ],
+    )
+    assert mapping.build({"Maize": " Yes", "HouseholdSize": "4"}) == [
+        {"displayName": "Maize", "dataElement": "GUvE51AL6sI", "value": True},
+        {"displayName": "HouseholdSize", "dataElement": "V9ohTgE9gt6", "value": "4"},
+        {"displayName": "ProductionPurpose", "dataElement": "uzEJJETmBoM", "value": None},
+    ]
+
+
+def test_tables_only_read_known_columns():
+    record = make_record()
+    assert len(PROFILE.build(record)) == len(PROFILE.fields)
+    assert len(FARMING_METHOD.build(record)) == len(FARMING_METHOD.fields)
+    assert {field.column for field in PROFILE.fields if field.column} <= set(COLUMNS)
@@ -0,0 +1,90 @@
+import csv
+
+import pytest
+
+from namis.integration.mapping import PROFILE
+from namis.integration.metadata import Validator
+from namis.integration.metadata import load_metadata
+from namis.integration.services import API
+from namis.integration.services import BulkProcessor
+from namis.integration.services import Namis
+
+from .factories import FakeAPI
+from .factories import fake_get
+from .factories import import_summary
+from .factories import make_record
+from .factories import program_metadata
+from .factories import write_csv
+
+METADATA = program_metadata(
+    attributes=[
+        ("W6kJs5es1rY", "TEXT", True, None),  # NationalID
+        ("ij3vRdw9lju", "TEXT", False, ["Male", "Female"]),  # Sex
+        ("gEjOqoZAviX", "DATE", False, None),  # Birthday
+    ],
+    elements=[
+        (Namis.household_stage, [("V9ohTgE9gt6", "INTEGER_POSITIVE", False, None)]),  # HouseholdSize
+        (Namis.farming_method_stage, [("GUvE51AL6sI", "BOOLEAN", False, None)]),  # Maize
+    ],
+)
+
+
+@pytest.fixture()
+def validator():
+    api = FakeAPI(metadata=METADATA)
+    return Validator(load_metadata(api, "PROGRAM0001"), PROFILE, Namis.stages)
+
+
+def _valid_record(**values):
+    return make_record(**{"Sex": "Female", "HouseholdSize": "4", **values})
+
+
+def test_metadata_is_cached():
+    api = FakeAPI(metadata=METADATA)
+    first = load_metadata(api, "PROGRAM0001")
+    second = load_metadata(api, "PROGRAM0001")
+    assert len(api.calls) == 1
+    assert first.attributes["W6kJs5es1rY"].mandatory
+    assert second.stages[Namis.household_stage]["V9ohTgE9gt6"].value_type == "INTEGER_POSITIVE"
+
+
+def test_valid_row_passes(validator):
+    assert validator.validate(_valid_record()) is None
+
+
+@pytest.mark.parametrize(
+    ("values", "error"),
+    [
+        ({"Blocks": ""}, "Blocks is empty"),
+        ({"NationalID": ""}, "NationalID is mandatory"),
+        ({"Sex": "F"}, "Sex: 'F' is not a valid option"),
+        ({"Birthday": "01/01/1980"}, "Birthday: '01/01/1980' is not a valid date"),
+        ({"HouseholdSize": "0"}, "HouseholdSize: '0' is not a valid integer_positive"),
+    ],
+)
+def test_invalid_row_is_explained(validator, values, error):
+    record = _valid_record()
+    record.update(values)
+    assert validator.validate(record) == error
+
+
+def test_invalid_rows_are_not_sent(monkeypatch, settings, tmp_path):
+    settings.NAMIS_VALIDATE = True
+    calls = []
+
+    def post(self, endpoint, payload):
+        calls.append(endpoint)
+        [instance] = payload["trackedEntityInstances"]
+        return import_summary(reference=instance["trackedEntityInstance"])
+
+    monkeypatch.setattr(API, "get", fake_get(METADATA))
+    monkeypatch.setattr(API, "post", post)
+    monkeypatch.setattr(Namis, "payload", lambda self: {"trackedEntityInstance": self.uids["trackedEntityInstance"]})
+    filepath = write_csv(tmp_path / "upload.csv", [_valid_record(), _valid_record(Sex="X")])
+
+    processor = BulkProcessor()
+    processor.read(filepath)
+
+    assert calls == [Namis.profile_endpoint]
+    with open(processor.failed_file) as file:
+        assert [row["Error"] for row in csv.DictReader(file)] == ["Sex: 'X' is not a valid option"]
@@ -0,0 +1,94 @@
+import pytest
+
+from namis.integration.mapping import PROFILE
+from namis.integration.metadata import Metadata
+from namis.integration.options import Normalizer
+from namis.integration.options import OptionIndex
+from namis.integration.rows import read_rows
+from namis.integration.services import API
+from namis.integration.services import ColumnarProcessor
+from namis.integration.services import Namis
+
+from .factories import fake_get
+from .factories import make_record
+from .factories import program_metadata
+from .factories import write_csv
+
+METADATA = program_metadata(
+    attributes=[
+        ("ij3vRdw9lju", "TEXT", False, ["Male", "Female"]),  # Sex
+        ("SuWgGzt14Je", "TEXT", False, ["Lilongwe", "Nkhata Bay"]),  # District
+    ],
+)
+
+
+@pytest.mark.parametrize(
+    ("value", "code"),
+    [
+        ("Female", "Female"),
+        (" female ", "Female"),
+        ("MALE", "Male"),
+        ("Femal", "Female"),
+        ("nkhata-bay", "Nkhata Bay"),
+        ("NkhataBay", "Nkhata Bay"),
+        ("Unknown", None),
+    ],
+)
+def test_lookup(value, code):
+    index = OptionIndex([("Male", "Male"), ("Female", "Female"), ("Nkhata Bay", "Nkhata Bay")])
+    assert index.lookup(value) == code
+
+
+@pytest.mark.parametrize("value", ["Unmarried", "Not Married", "Marr", "Widow"])
+def test_distant_spellings_are_not_matched(value):
+    index = OptionIndex([("MARRIED", "Married"), ("SINGLE", "Single"), ("WIDOWED", "Widowed")])
+    assert index.lookup(value) is None
+
+
+def test_ambiguous_spellings_are_not_matched():
+    index = OptionIndex([("1", "Grade A"), ("2", "Grade B")])
+    assert index.lookup("Grade C") is None
+
+
+def test_lookup_by_name():
+    index = OptionIndex([("1", "Primary school"), ("2", "Secondary school")])
+    assert index.lookup("secondary  School") == "2"
+
+
+def test_rows_are_translated_to_codes():
+    normalizer = Normalizer(Metadata.from_dict(METADATA), PROFILE, Namis.stages)
+    record = make_record(Sex=" male", District="lilongwe", Education="Primary")
+    row = normalizer.normalize(record)
+    assert (row["Sex"], row["District"], row["Education"]) == ("Male", "Lilongwe", "Primary")
+    assert record["Sex"] == " male"
+
+
+def test_unmapped_values_are_summarized(tmp_path):
+    normalizer = Normalizer(Metadata.from_dict(METADATA), PROFILE, Namis.stages)
+    records = [
+        make_record(Sex="M/F", District="Mzimba"),
+        make_record(Sex="M/F", District="Lilongwe"),
+        make_record(Sex="Female", District=""),
+    ]
+    with open(write_csv(tmp_path / "upload.csv", records), newline="") as file:
+        summary = normalizer.unmapped(read_rows(file))
+    assert summary == {"Sex": {"M/F": 2}, "District": {"Mzimba": 1}}
+
+
+def test_unmapped_values_are_logged_before_posting(monkeypatch, settings, tmp_path):
+    settings.NAMIS_VALIDATE = True
+    posted = []
+    monkeypatch.setattr(API, "get", fake_get(METADATA))
+    monkeypatch.setattr(Namis, "post", lambda self: posted.append(self.record["Sex"]) or ("TEI00000001", None))
+    records = [make_record(Sex="femal", District="Lilongwe"), make_record(Sex="M/F", District="Lilongwe")]
+    filepath = write_csv(tmp_path / "upload.csv", records)
+
+    processor = ColumnarProcessor()
+    processor.read(filepath)
+
+    assert posted == ["Female"]
+    with open(processor.log_file) as file:
+        lines = file.read().splitlines()
+    assert lines[0].endswith("Sex: 1 rows with unmappable values: 'M/F' (1)")
+    assert lines[1].endswith("Sex: 1 rows with values matched by spelling: 'femal' as 'Female' (1)")
+    assert lines[2].endswith("Row: 2, Error: Sex: 'M/F' is not a valid option")
@@ -0,0 +1,93 @@
+import csv
+
+from namis.integration.orgunits import OrgUnitIndex
+from namis.integration.orgunits import load_org_units
+from namis.integration.services import API
+from namis.integration.services import Namis
+from namis.integration.services import Processor
+
+from .factories import FakeAPI
+from .factories import fake_get
+from .factories import make_record
+from .factories import org_units_page
+from .factories import program_metadata
+from .factories import write_csv
+
+UNITS = {
+    "OU000000001": ("MW-LL-01", "Chimutu", ["Malawi", "Lilongwe", "TA Chimutu"]),
+    "OU000000002": ("MW-LL-02", "Mtsiliza", ["Malawi", "Lilongwe", "TA Kalumbu"]),
+    "OU000000003": ("MW-NB-01", "Mtsiliza", ["Malawi", "Nkhata Bay", "TA Timbiri"]),
+}
+
+
+class PagedAPI(FakeAPI):
+    def __init__(self, pages):
+        super().__init__()
+        self.pages = pages
+
+    def get(self, endpoint, params=None):
+        self.calls.append((endpoint, params))
+        return self.pages[params["page"] - 1]
+
+
+def test_lookup_by_uid_code_and_name():
+    index = OrgUnitIndex(UNITS)
+    assert index.resolve("OU000000002") == "OU000000002"
+    assert index.resolve(" mw-ll-02") == "OU000000002"
+    assert index.resolve("Chimutu") == "OU000000001"
+
+
+def test_names_are_scoped_by_district_and_ta():
+    index = OrgUnitIndex(UNITS)
+    assert index.resolve("Mtsiliza") is None
+    assert index.resolve("Mtsiliza", district="Nkhata Bay") == "OU000000003"
+    assert index.resolve("mtsiliza", district="Lilongwe", ta="TA Kalumbu") == "OU000000002"
+
+
+def test_hierarchy_is_paged_then_refreshed():
+    first = ("OU000000001", "MW-LL-01", "Chimutu", [])
+    second = ("OU000000002", "MW-LL-02", "Mtsiliza", [])
+    api = PagedAPI([org_units_page(first, page_count=2), org_units_page(second, page=2, page_count=2)])
+    assert load_org_units(api).resolve("Mtsiliza") == "OU000000002"
+    assert "filter" not in api.calls[0][1]
+
+    renamed = ("OU000000002", "MW-LL-02", "Kauma", [])
+    api = PagedAPI([org_units_page(renamed)])
+    index = load_org_units(api)
+    assert (index.resolve("Kauma"), index.resolve("Chimutu")) == ("OU000000002", "OU000000001")
+    assert api.calls[0][1]["filter"].startswith("lastUpdated:gt:")
+
+
+def test_hierarchy_is_pulled_in_full_once_per_ttl(monkeypatch, settings):
+    settings.NAMIS_ORG_UNIT_TTL = 60
+    now = [1000.0]
+    monkeypatch.setattr("namis.integration.orgunits.time.time", lambda: now[0])
+    first = ("OU000000001", "MW-LL-01", "Chimutu", [])
+    second = ("OU000000002", "MW-LL-02", "Mtsiliza", [])
+    load_org_units(PagedAPI([org_units_page(first, second)]))
+
+    now[0] += 30
+    load_org_units(PagedAPI([org_units_page()]))
+    now[0] += 30
+    api = PagedAPI([org_units_page(first)])
+    index = load_org_units(api)
+
+    assert "filter" not in api.calls[0][1]
+    assert (index.resolve("Chimutu"), index.resolve("Mtsiliza")) == ("OU000000001", None)
+
+
+def test_blocks_are_resolved_before_posting(monkeypatch, settings, tmp_path):
+    settings.NAMIS_VALIDATE = True
+    units = org_units_page(*[(uid, code, name, ancestors) for uid, (code, name, ancestors) in UNITS.items()])
+    monkeypatch.setattr(API, "get", fake_get(program_metadata(), units))
+    posted = []
+    monkeypatch.setattr(Namis, "post", lambda self: posted.append(self.record["Blocks"]) or ("TEI00000001", None))
+    records = [make_record(Blocks="Mtsiliza", District="Nkhata Bay"), make_record(Blocks="Mtsiliza", District="")]
+    filepath = write_csv(tmp_path / "upload.csv", records)
+
+    processor = Processor()
+    processor.read(filepath)
+
+    assert posted == ["OU000000003"]
+    with open(processor.failed_file) as file:
+        assert [row["Error"] for row in csv.DictReader(file)] == ["Blocks: 'Mtsiliza' is not a known org unit"]
@@ -0,0 +1,91 @@
+from namis.integration.ratelimit import RateLimiter
+from namis.integration.services import API
+
+
+class StubResponse:
+    status_code = 200
+    content = b'{"status": "OK", "response": {"importSummaries": [{"status": "SUCCESS", "reference": "TEI0000001"}]}}'
+
+    def json(self):
+        return {"status": "OK"}
+
+
+class StubSession:
+    def __init__(self):
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        return StubResponse()
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        pass
+
+
+def make_limiter(**kwargs):
+    options = {
+        "rate": 10,
+        "min_rate": 1,
+        "max_rate": 20,
+        "increase": 1,
+        "decrease": 0.5,
+        "latency": 5,
+        "cooldown": 0,
+    }
+    options.update(kwargs)
+    return RateLimiter(**options)
+
+
+def test_reserve_spaces_requests():
+    limiter = make_limiter()
+    waits = [limiter.reserve() for _ in range(5)]
+    assert waits[0] == 0
+    assert waits == sorted(waits)
+    assert waits[-1] > 0
+
+
+def test_success_increases_rate_additively():
+    limiter = make_limiter()
+    limiter.success(0.1)
+    assert limiter.rate == 10.1
+
+
+def test_rate_is_capped():
+    limiter = make_limiter(rate=20)
+    limiter.success(0.1)
+    assert limiter.rate == 20
+
+
+def test_failure_cuts_rate():
+    limiter = make_limiter()
+    limiter.failure("status 503")
+    assert limiter.rate == 5
+    limiter.failure("status 503")
+    limiter.failure("status 503")
+    limiter.failure("status 503")
+    assert limiter.rate == 1
+
+
+def test_slow_response_counts_as_failure():
+    limiter = make_limiter()
+    limiter.success(30)
+    assert limiter.rate == 5
+
+
+def test_cooldown_cuts_once_per_burst():
+    limiter = make_limiter(cooldown=60)
+    limiter.failure("status 429")
+    limiter.failure("status 429")
+    assert limiter.rate == 5
+
+
+def test_post_takes_a_token_and_reports_success():
+    api = API()
+    api.session = StubSession()
+    api.limiter = make_limiter()
+    api.post("trackedEntityInstances", {})
+    assert [method for method, _ in api.session.calls] == ["POST"]
+    assert api.limiter.rate == 10.1
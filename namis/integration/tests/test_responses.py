@@ -0,0 +1,22 @@
+from namis.integration.responses import parse_response
+
+
+def test_parse_reference():
+    result = parse_response(b'{"status": "OK", "response": {"importSummaries": [{"status": "SUCCESS", "reference": "TEI00000001"}]}}')
+    assert result.reference == "TEI00000001"
+    assert result.error is None
+
+
+def test_parse_conflicts():
+    result = parse_response(
+        b'{"status": "ERROR", "response": {"importSummaries": [{"status": "ERROR", '
+        b'"conflicts": [{"object": "W6kJs5es1rY", "value": "Value is not unique"}]}]}}',
+    )
+    assert result.reference is None
+    assert result.summaries[0].conflicts == ["Value is not unique"]
+    assert result.error == "Value is not unique"
+
+
+def test_parse_error_without_summaries():
+    result = parse_response(b'{"httpStatus": "Conflict", "status": "ERROR", "message": "Program not found"}')
+    assert result.error == "Program not found"
@@ -0,0 +1,36 @@
+import pytest
+
+from namis.integration.models import ImportJob
+from namis.integration.models import ImportRowResult
+from namis.integration.results import ResultStore
+from namis.integration.services import Namis
+from namis.integration.services import Processor
+
+from .factories import make_record
+from .factories import write_csv
+
+pytestmark = pytest.mark.django_db
+
+
+def test_results_are_written_in_batches():
+    store = ResultStore.start("upload.csv", batch_size=2)
+    store.add(1, ImportRowResult.Status.POSTED, "NID0000001", "TEI0000001")
+    assert not ImportRowResult.objects.exists()
+    store.add(2, ImportRowResult.Status.FAILED, "NID0000002", error="Bad")
+    assert ImportRowResult.objects.count() == 2
+
+
+def test_job_records_every_row(monkeypatch, settings, tmp_path):
+    settings.NAMIS_TRACK_RESULTS = True
+    monkeypatch.setattr(Namis, "post", lambda self: (None, "Bad") if self.record["Blocks"] == "BAD" else ("TEI0000001", None))
+    records = [make_record(NationalID="NID0000001"), make_record(NationalID="NID0000002", Blocks="BAD")]
+    filepath = write_csv(tmp_path / "upload.csv", records)
+
+    Processor().read(filepath)
+
+    job = ImportJob.objects.get()
+    assert (job.status, job.posted, job.failed, job.skipped) == (ImportJob.Status.COMPLETED, 1, 1, 0)
+    assert job.finished is not None
+    failed = job.results.filter(status=ImportRowResult.Status.FAILED).values_list("row", "national_id", "error")
+    assert list(failed) == [(2, "NID0000002", "Bad")]
+    assert job.results.get(row=1).reference == "TEI0000001"
@@ -0,0 +1,21 @@
+from namis.integration.retry import RetryPolicy
+
+
+def test_delay_is_bounded():
+    policy = RetryPolicy(attempts=10, backoff=1, max_backoff=4, budget=100)
+    assert all(0 <= policy.delay(attempt) <= min(4, 2**attempt) for attempt in range(10))
+
+
+def test_attempts_are_limited():
+    policy = RetryPolicy(attempts=2, backoff=1, max_backoff=4, budget=100)
+    assert policy.delay(1) is not None
+    assert policy.delay(2) is None
+
+
+def test_budget_is_shared_and_resettable():
+    policy = RetryPolicy(attempts=5, backoff=1, max_backoff=4, budget=2)
+    assert policy.delay(0) is not None
+    assert policy.delay(0) is not None
+    assert policy.delay(0) is None
+    policy.reset()
+    assert policy.delay(0) is not None
@@ -0,0 +1,22 @@
+import io
+
+from namis.integration.rows import Header
+from namis.integration.rows import Row
+from namis.integration.rows import read_rows
+
+
+def test_read_rows_like_dict_reader():
+    file = io.StringIO("a,b,c\n1,2,3\n\n4,5\n")
+    rows = list(read_rows(file))
+    assert [row.to_dict() for row in rows] == [
+        {"a": "1", "b": "2", "c": "3"},
+        {"a": "4", "b": "5", "c": None},
+    ]
+    assert rows[0]["b"] == "2"
+    assert rows[0].get("d") is None
+
+
+def test_rows_share_header():
+    rows = list(read_rows(io.StringIO("a,b\n1,2\n3,4\n")))
+    assert rows[0].header is rows[1].header
+    assert Row.from_dict({"a": "1", "b": "2"}).header is Header.of(["a", "b"])
@@ -0,0 +1,428 @@
+import asyncio
+import csv
+import itertools
+import threading
+import time
+
+import orjson
+import pytest
+import requests
+
+from namis.integration import services
+from namis.integration.encoding import encode
+from namis.integration.exceptions import APIError
+from namis.integration.exceptions import CircuitOpenError
+from namis.integration.models import ImportCheckpoint
+from namis.integration.models import ImportJob
+from namis.integration.models import RowDigest
+from namis.integration.responses import ImportResult
+from namis.integration.services import API
+from namis.integration.services import AsyncAPI
+from namis.integration.services import AsyncProcessor
+from namis.integration.services import Namis
+from namis.integration.services import PipelineProcessor
+from namis.integration.services import Processor
+from namis.integration.services import NamisBatch
+
+from .factories import FakeResponse
+from .factories import import_summary
+from .factories import make_record
+from .factories import write_csv
+
+
+class TestAPI:
+    def test_instance_is_shared(self):
+        assert API.instance() is API.instance()
+
+    def test_instance_is_recreated_after_fork(self, monkeypatch):
+        api = API.instance()
+        monkeypatch.setattr(API, "_pid", -1)
+        assert API.instance() is not api
+
+    def test_session_pool(self):
+        adapter = API.instance().session.get_adapter(API.api_url)
+        assert adapter._pool_maxsize == API.pool_size  # noqa: SLF001
+
+    def test_namis_uses_shared_client(self):
+        assert Namis({}).api is API.instance()
+
+    def test_transient_failures_are_retried(self, monkeypatch):
+        api = API()
+        responses = [requests.ConnectionError(), FakeResponse(503), FakeResponse(200)]
+
+        def request(method, **kwargs):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        monkeypatch.setattr(api.session, "request", request)
+        monkeypatch.setattr(api.retry, "delay", lambda attempt: 0)
+        assert api.post("events", {}).reference == "TEI00000001"
+
+    def test_outage_opens_circuit(self, monkeypatch, settings):
+        settings.NAMIS_BREAKER_THRESHOLD = 2
+        api = API()
+        monkeypatch.setattr(api.session, "request", lambda method, **kwargs: FakeResponse(503))
+        monkeypatch.setattr(api.retry, "delay", lambda attempt: None)
+        with pytest.raises(APIError):
+            api.post("events", {})
+        with pytest.raises(CircuitOpenError):
+            api.post("events", {})
+        with pytest.raises(CircuitOpenError):
+            api.post("events/abcdefghijk", {})
+        with pytest.raises(APIError):
+            api.post("enrollments", {})
+
+    def test_probe_answered_with_an_error_closes_circuit(self, monkeypatch, settings):
+        settings.NAMIS_BREAKER_THRESHOLD = 1
+        settings.NAMIS_BREAKER_TIMEOUT = 0
+        api = API()
+        responses = [FakeResponse(503), FakeResponse(404)]
+        monkeypatch.setattr(api.session, "request", lambda method, **kwargs: responses.pop(0))
+        monkeypatch.setattr(api.retry, "delay", lambda attempt: None)
+        with pytest.raises(CircuitOpenError):
+            api.get("organisationUnits")
+        with pytest.raises(APIError, match="status 404"):
+            api.get("organisationUnits")
+        breaker = api.breakers["organisationUnits"]
+        assert (breaker.state, breaker.probing) == (breaker.CLOSED, False)
+
+    def test_async_probe_answered_with_an_error_closes_circuit(self, monkeypatch, settings):
+        settings.NAMIS_BREAKER_THRESHOLD = 1
+        settings.NAMIS_BREAKER_TIMEOUT = 0
+        responses = [FakeResponse(503), FakeResponse(404)]
+
+        async def request(method, **kwargs):
+            return responses.pop(0)
+
+        async def run():
+            async with AsyncAPI() as api:
+                monkeypatch.setattr(api.session, "request", request)
+                monkeypatch.setattr(api.retry, "delay", lambda attempt: None)
+                with pytest.raises(CircuitOpenError):
+                    await api.get("organisationUnits")
+                with pytest.raises(APIError, match="status 404"):
+                    await api.get("organisationUnits")
+                return api.breakers["organisationUnits"]
+
+        breaker = asyncio.run(run())
+        assert (breaker.state, breaker.probing) == (breaker.CLOSED, False)
+
+    def test_cancelled_probe_reopens_circuit(self, monkeypatch, settings):
+        settings.NAMIS_BREAKER_THRESHOLD = 1
+        settings.NAMIS_BREAKER_TIMEOUT = 0
+        api = API()
+        api._breaker("events").failure()  # noqa: SLF001
+
+        def request(method, **kwargs):
+            raise asyncio.CancelledError
+
+        monkeypatch.setattr(api.session, "request", request)
+        with pytest.raises(asyncio.CancelledError):
+            api.post("events", {})
+        assert api.breakers["events"].allow()
+
+    def test_retries_give_up(self, monkeypatch):
+        api = API()
+        monkeypatch.setattr(api.session, "request", lambda method, **kwargs: FakeResponse(502))
+        monkeypatch.setattr(api.retry, "delay", lambda attempt: 0 if attempt < 2 else None)
+        with pytest.raises(APIError, match="status 502"):
+            api.post("events", {})
+
+
+class TestProcessor:
+    def test_job_pauses_and_resumes_same_row(self, monkeypatch, tmp_path):
+        calls = []
+
+        def post(self, endpoint, payload):
+            calls.append(endpoint)
+            if len(calls) == 1:
+                raise CircuitOpenError(endpoint, retry_after=0)
+            return import_summary("TEI00000001")
+
+        monkeypatch.setattr(API, "post", post)
+        filepath = write_csv(tmp_path / "upload.csv", [make_record()])
+        processor = Processor()
+        processor.read(filepath)
+
+        assert calls == [Namis.profile_endpoint] * 2 + [Namis.enrollment_endpoint, Namis.events_endpoint]
+        with open(processor.posted_file) as file:
+            assert len(list(csv.DictReader(file))) == 1
+
+
+    def test_pooled_results_are_recorded_in_order(self, monkeypatch, settings, tmp_path, caplog):
+        settings.NAMIS_SKIP_EXISTING = True
+        monkeypatch.setattr(API, "get", lambda self, endpoint, params=None: {})
+
+        def post(self):
+            # Later rows finish first
+            time.sleep((20 - int(self.record["NationalID"][3:])) / 1000)
+            return "TEI00000001", None
+
+        monkeypatch.setattr(Namis, "post", post)
+        national_ids = [f"NID{number:07}" for number in range(20)]
+        national_ids[7] = national_ids[3]
+        filepath = write_csv(tmp_path / "upload.csv", [make_record(NationalID=national_id) for national_id in national_ids])
+
+        caplog.set_level("INFO", logger="namis.integration.services")
+        processor = Processor(workers=4)
+        processor.read(filepath)
+
+        rows = [int(message.split(",")[0].split(": ")[1]) for message in caplog.messages if message.startswith("Row: ")]
+        assert rows == list(range(1, 21))
+        with open(processor.posted_file) as file:
+            assert [row["NationalID"] for row in csv.DictReader(file)] == national_ids[:7] + national_ids[8:]
+
+    def test_interrupted_pool_stops_paused_rows(self, monkeypatch, tmp_path):
+        def post(self):
+            raise CircuitOpenError("trackedEntityInstances", retry_after=3600)
+
+        def farmer(self, record):
+            if record["NationalID"] == "NID0000003":
+                raise SystemExit(143)
+
+        monkeypatch.setattr(Namis, "post", post)
+        monkeypatch.setattr(Processor, "_farmer", farmer)
+        records = [make_record(NationalID=f"NID{number:07}") for number in range(5)]
+        filepath = write_csv(tmp_path / "upload.csv", records)
+
+        started = time.monotonic()
+        with pytest.raises(SystemExit):
+            Processor(workers=2).read(filepath)
+        assert time.monotonic() - started < 5
+
+
+class TestAsyncProcessor:
+    def test_rows_are_recorded(self, monkeypatch, tmp_path):
+        in_flight = []
+        peak = []
+
+        async def post(self, endpoint, payload):
+            in_flight.append(endpoint)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0)
+            in_flight.pop()
+            payload = orjson.loads(encode(payload))
+            if payload.get("attributes") and payload["orgUnit"] == "BAD":
+                return import_summary(conflict="Invalid org unit")
+            return import_summary("TEI00000001")
+
+        monkeypatch.setattr(AsyncAPI, "post", post)
+        records = [make_record(), make_record(Blocks="BAD"), make_record()]
+        filepath = write_csv(tmp_path / "upload.csv", records)
+
+        processor = AsyncProcessor(concurrency=2)
+        processor.read(filepath)
+
+        with open(processor.posted_file) as file:
+            assert len(list(csv.DictReader(file))) == 2
+        with open(processor.failed_file) as file:
+            assert [row["Blocks"] for row in csv.DictReader(file)] == ["BAD"]
+        assert max(peak) <= 2
+
+
+    @pytest.mark.django_db(transaction=True)
+    def test_database_is_used_outside_the_event_loop(self, monkeypatch, settings, tmp_path):
+        settings.NAMIS_SKIP_EXISTING = True
+        settings.NAMIS_DELTA = True
+        settings.NAMIS_CHECKPOINT = True
+        settings.NAMIS_CHECKPOINT_ROWS = 1
+        settings.NAMIS_TRACK_RESULTS = True
+        settings.NAMIS_RESULT_BATCH_SIZE = 1
+        settings.NAMIS_LOOKUP_BATCH_SIZE = 1
+
+        async def post(self, endpoint, payload):
+            await asyncio.sleep(0)
+            return import_summary("TEI00000001")
+
+        monkeypatch.setattr(API, "get", lambda self, endpoint, params=None: {"trackedEntityInstances": []})
+        monkeypatch.setattr(AsyncAPI, "post", post)
+        records = [make_record(NationalID=f"NID{number:07}") for number in range(3)]
+        filepath = write_csv(tmp_path / "upload.csv", records)
+
+        AsyncProcessor(concurrency=2).read(filepath)
+
+        job = ImportJob.objects.get()
+        assert (job.status, job.posted) == (ImportJob.Status.COMPLETED, 3)
+        assert RowDigest.objects.count() == 3
+        assert not ImportCheckpoint.objects.exists()
+
+
+class TestPipelineProcessor:
+    def test_rows_flow_through_every_stage(self, monkeypatch, tmp_path):
+        def post(self):
+            if self.record["Blocks"] == "BAD":
+                raise ValueError("Invalid org unit")
+            return "TEI00000001", None
+
+        monkeypatch.setattr(Namis, "post", post)
+        records = [make_record(NationalID=f"NID{number:07}") for number in range(20)]
+        records[5]["Blocks"] = "BAD"
+        filepath = write_csv(tmp_path / "upload.csv", records)
+
+        processor = PipelineProcessor(senders=3, queue_size=2)
+        processor.read(filepath)
+
+        with open(processor.posted_file) as file:
+            assert len(list(csv.DictReader(file))) == 19
+        with open(processor.failed_file) as file:
+            assert [row["Error"] for row in csv.DictReader(file)] == ["Invalid org unit"]
+        assert processor.depths() == {"read": 0, "send": 0, "record": 0}
+
+    def test_failed_stage_fails_the_job(self, monkeypatch, tmp_path):
+        rows = services.read_rows
+
+        def read_rows(file):
+            yield from itertools.islice(rows(file), 2)
+            raise ValueError("Malformed row")
+
+        monkeypatch.setattr(Namis, "post", lambda self: ("TEI00000001", None))
+        monkeypatch.setattr(services, "read_rows", read_rows)
+        emails = []
+        monkeypatch.setattr(Processor, "_send_email", lambda self, file: emails.append(file))
+        records = [make_record(NationalID=f"NID{number:07}") for number in range(5)]
+        filepath = write_csv(tmp_path / "upload.csv", records)
+
+        processor = PipelineProcessor(senders=2)
+        with pytest.raises(ValueError, match="Malformed row"):
+            processor.read(filepath)
+
+        with open(processor.posted_file) as file:
+            assert len(list(csv.DictReader(file))) == 2
+        assert emails == []
+
+    def test_interrupted_job_stops_every_stage(self, monkeypatch, tmp_path):
+        def post(self):
+            raise CircuitOpenError("trackedEntityInstances", retry_after=3600)
+
+        def depths(self):
+            raise SystemExit(143)
+
+        monkeypatch.setattr(Namis, "post", post)
+        monkeypatch.setattr(PipelineProcessor, "depths", depths)
+        records = [make_record(NationalID=f"NID{number:07}") for number in range(20)]
+        filepath = write_csv(tmp_path / "upload.csv", records)
+
+        processor = PipelineProcessor(senders=2, queue_size=2)
+        processor.report_interval = 0.1
+        started = time.monotonic()
+        with pytest.raises(SystemExit):
+            processor.read(filepath)
+        assert time.monotonic() - started < 5
+        stages = {"reader", "transformer", "sender-0", "sender-1", "recorder"}
+        assert not [thread for thread in threading.enumerate() if thread.name in stages]
+
+
+class TestNamisBatch:
+    def test_nested_payload(self, api):
+        payload = Namis(make_record(), api=api).payload()
+        enrollment = payload["enrollments"][0]
+        assert enrollment["program"] == Namis.program
+        assert len(enrollment["events"]) == 4
+        assert "trackedEntityInstance" not in enrollment["events"][0]
+
+    def test_summaries_are_mapped_to_rows(self, monkeypatch, api):
+        records = [make_record(NationalID=f"NID{number:07}") for number in range(3)]
+        first, _, third = [Namis(record, api=api).uids["trackedEntityInstance"] for record in records]
+        failed_event = {"status": "ERROR", "description": "Event rejected"}
+        response = {
+            "response": {
+                "importSummaries": [
+                    {"status": "SUCCESS", "reference": first},
+                    {"status": "ERROR", "conflicts": [{"value": "Bad NationalID"}]},
+                    {
+                        "status": "SUCCESS",
+                        "reference": third,
+                        "enrollments": {
+                            "importSummaries": [
+                                {
+                                    "status": "SUCCESS",
+                                    "events": {"importSummaries": [failed_event]},
+                                },
+                            ],
+                        },
+                    },
+                ],
+            },
+        }
+        result = ImportResult.from_dict(response)
+        monkeypatch.setattr(api, "post", lambda endpoint, payload: result)
+        results = NamisBatch(records, api=api).post()
+        assert results == [
+            (first, None),
+            (None, "Bad NationalID"),
+            (third, "Event rejected"),
+        ]
+
+    def test_reordered_summaries_are_mapped_by_reference(self, monkeypatch, api):
+        records = [make_record(NationalID=f"NID{number:07}") for number in range(3)]
+        references = [Namis(record, api=api).uids["trackedEntityInstance"] for record in records]
+        response = {
+            "response": {
+                "importSummaries": [
+                    {"status": "SUCCESS", "reference": references[2]},
+                    {"status": "ERROR", "conflicts": [{"value": "Bad NationalID"}]},
+                    {"status": "SUCCESS", "reference": references[0]},
+                ],
+            },
+        }
+        result = ImportResult.from_dict(response)
+        monkeypatch.setattr(api, "post", lambda endpoint, payload: result)
+        results = NamisBatch(records, api=api).post()
+        assert results == [(references[0], None), (None, "Bad NationalID"), (references[2], None)]
+
+
+class TestNamis:
+    def test_requests_share_client_uids(self, api):
+        namis = Namis(make_record(), api=api)
+        reference, error = namis.post()
+
+        (_, profile), (_, enrollment), (_, events) = api.calls
+        assert [endpoint for endpoint, _ in api.calls] == [
+            Namis.profile_endpoint,
+            Namis.enrollment_endpoint,
+            Namis.events_endpoint,
+        ]
+        assert profile["trackedEntityInstance"] == namis.uids["trackedEntityInstance"]
+        assert enrollment["enrollment"] == namis.uids["enrollment"]
+        assert {event["event"] for event in events["events"]} == {
+            namis.uids[event["programStage"]] for event in events["events"]
+        }
+        assert (reference, error) == ("TEI00000001", None)
+
+    def test_bodies_match_payloads(self, api):
+        record = make_record(HouseholdSize='4 "large"', Maize="no")
+        namis = Namis(record, api=api)
+        profile = namis._profile_body(Namis.entity_type, "OU000000001", record)  # noqa: SLF001
+        events = namis._events_body("TEI00000001", "OU000000001", record)  # noqa: SLF001
+        assert orjson.loads(profile) == namis._profile_payload(Namis.entity_type, "OU000000001", record)  # noqa: SLF001
+        assert orjson.loads(events) == {
+            "events": namis._event_payloads("TEI00000001", "OU000000001", record),  # noqa: SLF001
+        }
+
+    def test_uids_are_stable_per_farmer(self, api):
+        first = Namis(make_record(), api=api).uids
+        assert Namis(make_record(), api=api).uids == first
+        assert Namis(make_record(NationalID="NID0000002"), api=api).uids != first
+
+    def test_failed_stage_is_resumed(self, api, monkeypatch):
+        namis = Namis(make_record(), api=api)
+        post = api.post
+
+        def fail_events(endpoint, payload):
+            if endpoint == Namis.events_endpoint:
+                raise APIError("status 503 on events")
+            return post(endpoint, payload)
+
+        monkeypatch.setattr(api, "post", fail_events)
+        assert namis.post() == ("TEI00000001", "status 503 on events")
+
+        monkeypatch.setattr(api, "post", post)
+        api.calls.clear()
+        assert namis.post() == ("TEI00000001", None)
+        assert [endpoint for endpoint, _ in api.calls] == [Namis.events_endpoint]
+
+    def test_failed_profile_stops_the_row(self, api, monkeypatch):
+        monkeypatch.setattr(api, "post", lambda endpoint, payload: import_summary(conflict="Bad"))
+        assert Namis(make_record(), api=api).post() == (None, "Bad")
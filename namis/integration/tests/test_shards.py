@@ -0,0 +1,65 @@
+import csv
+
+from namis.integration import shards
+from namis.integration.rows import read_rows
+from namis.integration.services import Namis
+from namis.integration.services import Processor
+from namis.integration.shards import open_range
+from namis.integration.shards import post_sharded
+from namis.integration.shards import shard_ranges
+
+from .factories import make_record
+from .factories import write_csv
+
+
+def test_ranges_end_on_rows(tmp_path):
+    filepath = tmp_path / "upload.csv"
+    filepath.write_bytes(b'Name,Note\na,"one\ntwo"\nb,x\nc,"three\nfour"\nd,y\n')
+    header_end, ranges = shard_ranges(filepath, 3)
+
+    rows = []
+    for start, stop, _ in ranges:
+        with open_range(filepath, header_end, start, stop, binary=False) as file:
+            rows.append([row.to_dict() for row in read_rows(file)])
+    assert header_end == len(b"Name,Note\n")
+    assert sum(rows, []) == [
+        {"Name": "a", "Note": "one\ntwo"},
+        {"Name": "b", "Note": "x"},
+        {"Name": "c", "Note": "three\nfour"},
+        {"Name": "d", "Note": "y"},
+    ]
+    assert all(rows)
+
+
+def test_offsets_count_rows_not_lines(tmp_path):
+    filepath = tmp_path / "upload.csv"
+    filepath.write_bytes(b"Name,Note\n" + b"".join(b'%d,"line\nbreak"\n\n' % number for number in range(10)))
+    header_end, ranges = shard_ranges(filepath, 2)
+
+    offsets = []
+    for start, stop, offset in ranges:
+        offsets.append(offset)
+        with open_range(filepath, header_end, start, stop, binary=False) as file:
+            first = next(read_rows(file))
+        assert int(first["Name"]) == offset
+    assert len(offsets) == 2
+    assert offsets[0] == 0
+
+
+def test_shards_are_posted_and_merged(monkeypatch, tmp_path):
+    monkeypatch.setattr(Namis, "post", lambda self: (None, "Bad") if self.record["Blocks"] == "BAD" else ("TEI0000001", None))
+    emails = []
+    monkeypatch.setattr(shards, "send_completed_email", lambda *args, **kwargs: emails.append(args))
+    records = [make_record(NationalID=f"NID{number:07}") for number in range(12)]
+    records[9]["Blocks"] = "BAD"
+    filepath = write_csv(tmp_path / "upload.csv", records)
+
+    post_sharded(str(filepath), processes=3)
+
+    with open(Processor.posted_file) as file:
+        assert [row["NationalID"] for row in csv.DictReader(file)] == [
+            record["NationalID"] for record in records if record["Blocks"] != "BAD"
+        ]
+    with open(Processor.log_file) as file:
+        assert "Row: 10, Error: Bad" in file.read()
+    assert emails == [(str(filepath),)]
@@ -0,0 +1,68 @@
+import csv
+import time
+
+from namis.integration.sinks import ResultFile
+
+
+def _lines(path):
+    if not path.exists():
+        return []
+    with open(path, newline="") as file:
+        return list(csv.reader(file))
+
+
+def test_flushed_every_n_rows(tmp_path):
+    path = tmp_path / "posted.csv"
+    sink = ResultFile(str(path), rows=2, seconds=3600)
+    sink.writerow(["NationalID"], ["NID0000001"])
+    assert _lines(path) == []
+    sink.writerow(["NationalID"], ["NID0000002"])
+    assert _lines(path) == [["NationalID"], ["NID0000001"], ["NID0000002"]]
+    sink.writerow(["NationalID"], ["NID0000003"])
+    sink.close()
+    assert len(_lines(path)) == 4
+
+
+def test_flushed_after_t_seconds_without_further_writes(tmp_path):
+    # A job paused on an open circuit writes nothing, its rows still reach disk
+    path = tmp_path / "posted.csv"
+    sink = ResultFile(str(path), rows=100, seconds=0.05)
+    sink.writerow(["NationalID"], ["NID0000001"])
+    assert _lines(path) == []
+    deadline = time.monotonic() + 5
+    while not _lines(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _lines(path) == [["NationalID"], ["NID0000001"]]
+    sink.close()
+
+
+def test_each_flush_is_one_write_of_whole_lines(tmp_path):
+    # Jobs appending to the same file cannot split each other's records
+    writes = []
+
+    class Spy:
+        def __init__(self, file):
+            self.file = file
+
+        def write(self, data):
+            writes.append(bytes(data))
+            return self.file.write(data)
+
+        def close(self):
+            self.file.close()
+
+    sink = ResultFile(str(tmp_path / "posted.csv"), rows=2, seconds=3600)
+    sink.writerow(["NationalID"], ["NID0000001"])
+    sink.file = Spy(sink.file)
+    sink.writerow(["NationalID"], ['NID "2", line\nbreak'])
+    sink.close()
+    assert writes == [b'NationalID\r\nNID0000001\r\n"NID ""2"", line\nbreak"\r\n']
+
+
+def test_header_is_written_once(tmp_path):
+    path = tmp_path / "posted.csv"
+    for national_id in ("NID0000001", "NID0000002"):
+        sink = ResultFile(str(path), rows=100, seconds=5)
+        sink.writerow(["NationalID"], [national_id])
+        sink.close()
+    assert _lines(path) == [["NationalID"], ["NID0000001"], ["NID0000002"]]
@@ -0,0 +1,43 @@
+import csv
+
+from django.core.files.storage import default_storage
+
+from namis.integration import tasks
+from namis.integration.services import Namis
+from namis.integration.services import Processor
+
+from .factories import make_record
+from .factories import write_csv
+
+
+def test_large_files_are_posted_in_chunks(monkeypatch, settings, tmp_path):
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+    settings.NAMIS_CHUNK_ROWS = 4
+    monkeypatch.setattr(default_storage, "open", lambda name, mode: open(name, mode, newline=""))
+    chunks = []
+    post_chunk = tasks.post_chunk.run
+
+    def run(filepath, job, index, start, stop, mode=None, job_id=None):
+        chunks.append((start, stop))
+        return post_chunk(filepath, job, index, start, stop, mode, job_id)
+
+    monkeypatch.setattr(tasks.post_chunk, "run", run)
+    emails = []
+    monkeypatch.setattr(tasks, "send_completed_email", lambda *args, **kwargs: emails.append(kwargs))
+    monkeypatch.setattr(Namis, "post", lambda self: (None, "Bad") if self.record["Blocks"] == "BAD" else ("TEI0000001", None))
+    records = [make_record(NationalID=f"NID{number:07}") for number in range(10)]
+    records[6]["Blocks"] = "BAD"
+
+    tasks.post_file(str(write_csv(tmp_path / "upload.csv", records)))
+
+    assert chunks == [(0, 4), (4, 8), (8, 10)]
+    with open(Processor.posted_file) as file:
+        assert [row["NationalID"] for row in csv.DictReader(file)] == [
+            record["NationalID"] for record in records if record["Blocks"] != "BAD"
+        ]
+    with open(Processor.failed_file) as file:
+        assert [row["NationalID"] for row in csv.DictReader(file)] == ["NID0000006"]
+    with open(Processor.log_file) as file:
+        assert file.read().count("Row: 7, Error: Bad") == 1
+    assert emails == [{"status": "completed successfully", "unchanged": 0}]
+    assert not (tmp_path / "chunks").exists() or not any((tmp_path / "chunks").iterdir())
@@ -0,0 +1,18 @@
+import re
+
+from namis.integration.util import generate_uid
+
+UID_PATTERN = re.compile(r"^[a-zA-Z][a-zA-Z0-9]{10}$")
+
+
+def test_generate_uid_format():
+    assert all(UID_PATTERN.match(generate_uid()) for _ in range(100))
+
+
+def test_generate_uid_is_random_without_seed():
+    assert generate_uid() != generate_uid()
+
+
+def test_generate_uid_is_stable_for_seed():
+    assert generate_uid("NID0000001:enrollment") == generate_uid("NID0000001:enrollment")
+    assert UID_PATTERN.match(generate_uid("NID0000001:enrollment"))
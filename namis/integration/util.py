@@ -1,18 +1,10 @@
+import hashlib
+import secrets
+import string
 
-class JsonObject:
-
-    def __init__(self, dictionary):
-        for key, value in dictionary.items():
-            if isinstance(value, dict):
-                self.__dict__[key] = JsonObject(value)
-            elif isinstance(value, list):
-                self.__dict__[key] = [JsonObject(item) if isinstance(item, dict) else item for item in value]
-            else:
-                self.__dict__[key] = value
-
-    def __getattr__(self, name):
-        return self.__dict__.get(name)
-
+UID_LETTERS = string.ascii_letters
+UID_CHARACTERS = string.ascii_letters + string.digits
+UID_LENGTH = 11
 
 
 def to_bool(value):
@@ -26,5 +18,18 @@ def to_bool(value):
             return False
         
 
+def generate_uid(seed=None):
+    # DHIS2 identifiers: a letter followed by ten letters or digits. The same
+    # seed always yields the same uid, so a reposted row targets the same object.
+    if seed is None:
+        first = secrets.choice(UID_LETTERS)
+        rest = [secrets.choice(UID_CHARACTERS) for _ in range(UID_LENGTH - 1)]
+    else:
+        digest = hashlib.sha256(seed.encode()).digest()
+        first = UID_LETTERS[digest[0] % len(UID_LETTERS)]
+        rest = [UID_CHARACTERS[byte % len(UID_CHARACTERS)] for byte in digest[1:UID_LENGTH]]
+    return first + "".join(rest)
+
+
 def get_message():
     return "File uploaded. You will be nofified when the process is completed"
\ No newline at end of file